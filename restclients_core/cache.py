@@ -1,6 +1,100 @@
 # Copyright 2024 UW-IT, University of Washington
 # SPDX-License-Identifier: Apache-2.0
 
+from restclients_core.models import CacheHTTP, MappedCacheHTTP
+from restclients_core.exceptions import ImproperlyConfigured
+from restclients_core.util.cache_control import (
+    get_header, get_freshness_lifetime)
+from restclients_core.util.settings import get_service_settings
+from restclients_core.util.module import get_class
+from restclients_core.util.compression import (
+    compress_body, CompressedCacheHTTP)
+from commonconf import settings
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+import inspect
+import json
+import mmap
+import os
+import tempfile
+import time
+
+NOT_MODIFIED_IGNORED_HEADERS = ("content-length", "content-encoding",
+                                "transfer-encoding")
+
+_ttl_caches = {}
+
+
+def get_service_setting(service, key, default=None):
+    """
+    Cache implementations only know the service name, so this follows the
+    same lookup order as DAO.get_service_setting: the service specific
+    RESTCLIENTS_<SERVICE>_<KEY> setting first, then RESTCLIENTS_<KEY>.
+    """
+    return get_service_settings(service).get(key, default)
+
+
+def merge_headers(headers, update_headers):
+    """
+    Returns a copy of stored response headers updated with the headers of a
+    304 response, ignoring those that describe the (empty) 304 body.
+    """
+    merged = {}
+    updates = {}
+    for header, value in update_headers.items():
+        if header.lower() not in NOT_MODIFIED_IGNORED_HEADERS:
+            updates[header.lower()] = (header, value)
+
+    for header, value in headers.items():
+        if header.lower() not in updates:
+            merged[header] = value
+
+    for header, value in updates.values():
+        merged[header] = value
+    return merged
+
+
+def compress_cache_body(service, data):
+    """
+    Compresses a response body for storage if it is at least as large as
+    the CACHE_COMPRESS_MIN_SIZE service setting.  Compression is disabled
+    by default.  Returns a tuple of the compressed body and the text
+    encoding of the original, or None.
+    """
+    min_size = get_service_setting(service, "CACHE_COMPRESS_MIN_SIZE", None)
+    if min_size is None:
+        return None
+    return compress_body(service, data, int(min_size))
+
+
+def accepts_ttl(cache):
+    """
+    Returns True if the cache's processResponse takes a ttl keyword
+    argument.  Caches written for the original
+    processResponse(service, url, response) signature don't.
+    """
+    cache_class = cache.__class__
+    if cache_class not in _ttl_caches:
+        try:
+            parameters = inspect.signature(
+                cache.processResponse).parameters.values()
+        except (TypeError, ValueError):
+            parameters = []
+        _ttl_caches[cache_class] = any(
+            p.name == "ttl" or p.kind == p.VAR_KEYWORD for p in parameters)
+    return _ttl_caches[cache_class]
+
+
+def process_response(cache, service, url, response, ttl=None):
+    """
+    Passes a response to cache.processResponse, with a ttl if one is given
+    and the cache accepts it.  Otherwise the cache uses its own lifetime.
+    """
+    if ttl is None or not accepts_ttl(cache):
+        return cache.processResponse(service, url, response)
+    return cache.processResponse(service, url, response, ttl=ttl)
+
 
 class NoCache(object):
     """
@@ -9,8 +103,490 @@ class NoCache(object):
     def getCache(self, service, url, headers):
         return None
 
-    def processResponse(self, service, url, response):
+    def processResponse(self, service, url, response, ttl=None):
         pass
 
     def deleteCache(self, service, url):
         return None
+
+
+class CacheEntry(object):
+    __slots__ = ("status", "headers", "data", "size", "expires",
+                 "refresh_until", "compressed", "encoding")
+
+    def __init__(self, status, headers, data, expires):
+        self.status = status
+        self.headers = headers
+        self.data = data
+        self.size = len(data) if data else 0
+        self.expires = expires
+        # Until then, another caller is refreshing the entry
+        self.refresh_until = 0
+        self.compressed = False
+        self.encoding = None
+
+
+class MemoryCache(object):
+    """
+    A thread-safe, in-process LRU cache of successful GET responses.
+
+    Entries are evicted least recently used first once either
+    RESTCLIENTS_MEMORY_CACHE_MAX_ENTRIES or RESTCLIENTS_MEMORY_CACHE_MAX_BYTES
+    (total body size) is exceeded.  Entries expire after the CACHE_TTL
+    service setting, in seconds.  Expired entries with an ETag or
+    Last-Modified header are kept, and revalidated with a conditional GET.
+    Within the CACHE_STALE_WINDOW service setting, expired entries are
+    still returned while the DAO refreshes them in the background.  If a
+    refresh hasn't succeeded after CACHE_REFRESH_TIMEOUT (default: 30)
+    seconds, the next caller tries again.  Bodies of at least
+    CACHE_COMPRESS_MIN_SIZE bytes are stored compressed.
+    """
+    settings_name = "MEMORY_CACHE"
+    default_ttl = 60
+    default_max_entries = 1000
+    default_max_bytes = 32 * 1024 * 1024
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._size = 0
+        self.max_entries = int(getattr(
+            settings, "RESTCLIENTS_{}_MAX_ENTRIES".format(self.settings_name),
+            self.default_max_entries))
+        self.max_bytes = int(getattr(
+            settings, "RESTCLIENTS_{}_MAX_BYTES".format(self.settings_name),
+            self.default_max_bytes))
+
+    def getCache(self, service, url, headers):
+        key = (service, url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            self._entries.move_to_end(key)
+
+            now = time.time()
+            if entry.expires <= now:
+                conditional_headers = self._get_conditional_headers(entry)
+                revalidate_headers = dict(headers or {})
+                revalidate_headers.update(conditional_headers)
+
+                stale_window = self.get_stale_window(service, url)
+                if stale_window and entry.expires + stale_window > now:
+                    # Serve the stale response, and have only one caller
+                    # at a time refresh it
+                    value = {"response": self._get_response(service, entry),
+                             "stale": True}
+                    if entry.refresh_until <= now:
+                        entry.refresh_until = now + self.get_refresh_timeout(
+                            service, url)
+                        value["headers"] = revalidate_headers
+                    return value
+
+                if not conditional_headers:
+                    self._remove(key)
+                    return None
+
+                # Keep the stale entry, so a 304 can refresh it
+                return {"headers": revalidate_headers}
+
+        return {"response": self._get_response(service, entry)}
+
+    def processResponse(self, service, url, response, ttl=None):
+        """
+        Stores a 200 response for the service's cache lifetime.  When the
+        DAO passes a ttl, the response is stored for that long regardless
+        of its status.
+        """
+        if response.status == 304:
+            return self._revalidate(service, url, response, ttl)
+
+        if ttl is None:
+            if response.status != 200:
+                return
+            ttl = self.get_cache_expiration_time(service, url,
+                                                 response.status)
+        if not ttl:
+            return
+
+        self._store(service, url, response, ttl)
+
+    def deleteCache(self, service, url):
+        with self._lock:
+            self._remove((service, url))
+
+    def get_cache_expiration_time(self, service, url, status=200):
+        """
+        Override this method to define service specific cache lifetimes,
+        in seconds.  A return value of 0 or None disables caching.
+        """
+        return float(get_service_setting(service, "CACHE_TTL",
+                                         self.default_ttl))
+
+    def get_stale_window(self, service, url):
+        """
+        The number of seconds past expiration that a response may still be
+        served while it is refreshed in the background, from the
+        CACHE_STALE_WINDOW service setting.  0 disables serving stale
+        responses.
+        """
+        return float(get_service_setting(service, "CACHE_STALE_WINDOW", 0))
+
+    def get_refresh_timeout(self, service, url):
+        """
+        The number of seconds to wait for a refresh of a stale response
+        before letting another caller try, from the CACHE_REFRESH_TIMEOUT
+        service setting.
+        """
+        return float(get_service_setting(service, "CACHE_REFRESH_TIMEOUT",
+                                         30))
+
+    def _store(self, service, url, response, ttl):
+        entry = CacheEntry(response.status, dict(response.headers or {}),
+                           response.data, time.time() + ttl)
+
+        compressed = compress_cache_body(service, entry.data)
+        if compressed is not None:
+            data, entry.encoding = compressed
+            entry.compressed = True
+            entry.data = data
+            entry.size = len(data)
+        if entry.size > self.max_bytes:
+            return
+
+        key = (service, url)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._size += entry.size
+
+            while (len(self._entries) > self.max_entries or
+                    self._size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+
+    def _revalidate(self, service, url, response, ttl=None):
+        """
+        Merges a 304 Not Modified response into the stored entry, and
+        restarts its lifetime.  Without a ttl from the DAO, that is the
+        lifetime allowed by the merged headers when the CACHE_CONTROL
+        service setting is on, or the cache's own lifetime.
+        """
+        key = (service, url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            entry.headers = merge_headers(entry.headers,
+                                          dict(response.headers or {}))
+            if ttl is None:
+                ttl = self._get_revalidated_ttl(service, url, entry.headers)
+            if ttl:
+                entry.expires = time.time() + ttl
+            entry.refresh_until = 0
+
+        return {"response": self._get_response(service, entry)}
+
+    def _get_revalidated_ttl(self, service, url, headers):
+        ttl = None
+        if get_service_setting(service, "CACHE_CONTROL", False):
+            ttl = get_freshness_lifetime(
+                headers,
+                get_service_setting(service, "CACHE_CONTROL_MAX_TTL", None))
+        if ttl is None:
+            ttl = self.get_cache_expiration_time(service, url, 200)
+        return ttl
+
+    def _get_conditional_headers(self, entry):
+        conditional_headers = {}
+        etag = get_header(entry.headers, "ETag")
+        if etag:
+            conditional_headers["If-None-Match"] = etag
+
+        last_modified = get_header(entry.headers, "Last-Modified")
+        if last_modified:
+            conditional_headers["If-Modified-Since"] = last_modified
+
+        return conditional_headers
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def _get_response(self, service, entry):
+        if entry.compressed:
+            response = CompressedCacheHTTP(service, entry.data, entry.encoding)
+        else:
+            response = CacheHTTP()
+            response.data = entry.data
+        response.cache_class = self.__class__
+        response.status = entry.status
+        response.headers = dict(entry.headers)
+        return response
+
+
+class L1MemoryCache(MemoryCache):
+    """
+    The small, short lived memory tier of TwoTierCache.  Expired entries are
+    dropped rather than revalidated, so the shared tier is consulted.
+    """
+    settings_name = "L1_CACHE"
+    default_ttl = 5
+    default_max_entries = 100
+    default_max_bytes = 4 * 1024 * 1024
+
+    def get_cache_expiration_time(self, service, url, status=200):
+        return float(get_service_setting(service, "L1_CACHE_TTL",
+                                         self.default_ttl))
+
+    def get_stale_window(self, service, url):
+        return 0
+
+    def _get_conditional_headers(self, entry):
+        return {}
+
+
+class TwoTierCache(object):
+    """
+    Puts an in-process L1MemoryCache in front of the shared cache named by
+    RESTCLIENTS_L2_CACHE_CLASS.  Shared cache hits are copied into the
+    memory tier, and responses are written through to both.
+    """
+    def __init__(self):
+        self.l1 = L1MemoryCache()
+        l2_class = getattr(settings, "RESTCLIENTS_L2_CACHE_CLASS", None)
+        self.l2 = get_class(l2_class)() if l2_class else NoCache()
+
+    def getCache(self, service, url, headers):
+        value = self.l1.getCache(service, url, headers)
+        if value is not None:
+            return value
+
+        value = self.l2.getCache(service, url, headers)
+        if value and "response" in value and not value.get("stale"):
+            self.l1.processResponse(service, url, value["response"])
+        return value
+
+    def processResponse(self, service, url, response, ttl=None):
+        value = process_response(self.l2, service, url, response, ttl)
+        if ttl is not None:
+            ttl = min(ttl, self.l1.get_cache_expiration_time(service, url))
+
+        if value and "response" in value:
+            response = value["response"]
+        self.l1.processResponse(service, url, response, ttl=ttl)
+        return value
+
+    def deleteCache(self, service, url):
+        self.l1.deleteCache(service, url)
+        return self.l2.deleteCache(service, url)
+
+
+class DiskCache(object):
+    """
+    A persistent cache of successful GET responses, stored as one file per
+    response in RESTCLIENTS_DISK_CACHE_DIR (default: a restclients_cache_<uid>
+    directory in the temp directory), so it survives restarts and can be
+    shared by the workers on a host.  The directory must belong to the
+    user running the process, and not be writable by other users.
+    Response bodies are memory-mapped, and only copied into memory when
+    read.  Entries expire after the CACHE_TTL service setting, in seconds.
+    Bodies of at least CACHE_COMPRESS_MIN_SIZE bytes are stored compressed.
+
+    Every RESTCLIENTS_DISK_CACHE_SWEEP_INTERVAL seconds, or sooner once
+    this process has written enough to pass a limit, expired files are
+    deleted.  Then, while the directory holds more than
+    RESTCLIENTS_DISK_CACHE_MAX_ENTRIES files or
+    RESTCLIENTS_DISK_CACHE_MAX_BYTES bytes, the files closest to expiring
+    are deleted.
+    """
+    settings_name = "DISK_CACHE"
+    default_ttl = 60
+    default_max_entries = 10000
+    default_max_bytes = 256 * 1024 * 1024
+    default_sweep_interval = 300
+
+    def __init__(self):
+        self.path = getattr(settings, "RESTCLIENTS_DISK_CACHE_DIR", None)
+        if not self.path:
+            self.path = os.path.join(tempfile.gettempdir(),
+                                     "restclients_cache_{}".format(
+                                         os.getuid()))
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        self._check_path()
+        self.max_entries = int(getattr(
+            settings, "RESTCLIENTS_{}_MAX_ENTRIES".format(self.settings_name),
+            self.default_max_entries))
+        self.max_bytes = int(getattr(
+            settings, "RESTCLIENTS_{}_MAX_BYTES".format(self.settings_name),
+            self.default_max_bytes))
+        self.sweep_interval = float(getattr(
+            settings,
+            "RESTCLIENTS_{}_SWEEP_INTERVAL".format(self.settings_name),
+            self.default_sweep_interval))
+        self._sweep_lock = Lock()
+        # Sweep on the first write, to clear files left by earlier runs
+        self._next_sweep = 0
+        self._entries = 0
+        self._size = 0
+
+    def getCache(self, service, url, headers):
+        file_path = self._get_file_path(service, url)
+        try:
+            with open(file_path, "rb") as handle:
+                body = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Missing, or an empty file
+            return None
+
+        offset = body.find(b"\n")
+        try:
+            meta = json.loads(body[:offset])
+            expired = meta["expires"] <= time.time()
+        except (ValueError, KeyError, TypeError):
+            expired = True
+
+        if expired:
+            body.close()
+            self._remove(file_path)
+            return None
+
+        body = memoryview(body)[offset + 1:]
+        if meta.get("compressed"):
+            response = CompressedCacheHTTP(service, body, meta["encoding"])
+        else:
+            response = MappedCacheHTTP(body, meta["encoding"])
+        response.cache_class = self.__class__
+        response.status = meta["status"]
+        response.headers = meta["headers"]
+        return {"response": response}
+
+    def processResponse(self, service, url, response, ttl=None):
+        if ttl is None:
+            if response.status != 200:
+                return
+            ttl = self.get_cache_expiration_time(service, url,
+                                                 response.status)
+        if not ttl:
+            return
+
+        data = response.data
+        encoding = None
+        compressed = compress_cache_body(service, data)
+        if compressed is not None:
+            data, encoding = compressed
+        elif isinstance(data, str):
+            encoding = "utf-8"
+            data = data.encode(encoding)
+
+        expires = time.time() + ttl
+        meta = json.dumps({
+            "service": service,
+            "url": url,
+            "status": response.status,
+            "headers": dict(response.headers or {}),
+            "encoding": encoding,
+            "compressed": compressed is not None,
+            "expires": expires,
+        }).encode("utf-8")
+
+        # Write to a temporary file first, so readers never see a partial
+        # response
+        handle, temp_path = tempfile.mkstemp(dir=self.path)
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                temp_file.write(meta)
+                temp_file.write(b"\n")
+                temp_file.write(data or b"")
+            # The modification time is the expiration time, so sweep()
+            # doesn't have to open files
+            os.utime(temp_path, (time.time(), expires))
+            os.replace(temp_path, self._get_file_path(service, url))
+        except OSError:
+            self._remove(temp_path)
+            return
+
+        # An estimate, as other processes write to the same directory
+        self._entries += 1
+        self._size += len(meta) + 1 + len(data or b"")
+        if (time.time() >= self._next_sweep or
+                self._entries > self.max_entries or
+                self._size > self.max_bytes):
+            self.sweep()
+
+    def sweep(self):
+        """
+        Deletes expired files, then the files closest to expiring until the
+        cache is within its limits.
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            # Another thread is sweeping
+            return
+
+        try:
+            now = time.time()
+            files = []
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".cache"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if stat.st_mtime <= now:
+                        self._remove(entry.path)
+                    else:
+                        files.append((stat.st_mtime, stat.st_size,
+                                      entry.path))
+
+            files.sort()
+            count = len(files)
+            size = sum(file_size for expires, file_size, path in files)
+            for expires, file_size, path in files:
+                if count <= self.max_entries and size <= self.max_bytes:
+                    break
+                self._remove(path)
+                count -= 1
+                size -= file_size
+
+            self._entries = count
+            self._size = size
+            self._next_sweep = now + self.sweep_interval
+        finally:
+            self._sweep_lock.release()
+
+    def deleteCache(self, service, url):
+        self._remove(self._get_file_path(service, url))
+
+    def get_cache_expiration_time(self, service, url, status=200):
+        """
+        Override this method to define service specific cache lifetimes,
+        in seconds.  A return value of 0 or None disables caching.
+        """
+        return float(get_service_setting(service, "CACHE_TTL",
+                                         self.default_ttl))
+
+    def _check_path(self):
+        """
+        Other users mustn't be able to add responses to the cache.
+        """
+        stat = os.lstat(self.path)
+        if (not os.path.isdir(self.path) or os.path.islink(self.path) or
+                stat.st_uid != os.getuid() or stat.st_mode & 0o022):
+            raise ImproperlyConfigured(
+                "Disk cache directory {} must be owned by the current user, "
+                "and not writable by others".format(self.path))
+
+    def _get_file_path(self, service, url):
+        key = sha256("{} {}".format(service, url).encode("utf-8"))
+        return os.path.join(self.path, "{}.cache".format(key.hexdigest()))
+
+    def _remove(self, file_path):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
@@ -8,24 +8,57 @@ from restclients_core.util.local_cache import (
     set_cache_value, get_cache_value)
 from restclients_core.models import MockHTTP, CacheHTTP
 from restclients_core.exceptions import (
-    ImproperlyConfigured, DataFailureException)
-from restclients_core.cache import NoCache
+    ImproperlyConfigured, DataFailureException, CircuitOpenException,
+    RateLimitException, BulkheadFullException)
+from restclients_core.cache import NoCache, process_response
 from restclients_core.util.performance import PerformanceDegradation
-from importlib import import_module
-from commonconf import settings
+from restclients_core.util.coalesce import SingleFlight, AsyncSingleFlight
+from restclients_core.util.latency import LatencyWindow
+from restclients_core.util.circuit import CircuitBreaker
+from restclients_core.util.budget import RequestBudget
+from restclients_core.util.rate_limit import RateLimiter
+from restclients_core.util.bulkhead import Bulkhead
+from restclients_core.util.ssl_context import get_ssl_context
+from restclients_core.util.settings import get_service_settings
+from restclients_core.util.module import get_class
+from restclients_core.util.cache_control import (
+    get_header, get_freshness_lifetime)
+from restclients_core.util.cache_key import get_cache_key
+from restclients_core.thread import (
+    GenericPrefetchThread, QueueThread, generic_prefetch)
+from functools import partial
+from operator import methodcaller
 from urllib3 import connection_from_url
 from urllib3.util import Timeout
 from urllib3.util.retry import Retry
-from urllib3.exceptions import HTTPError
-from prometheus_client import Histogram, Counter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.exceptions import (
+    HTTPError, MaxRetryError, ReadTimeoutError, ClosedPoolError)
+from prometheus_client import Histogram, Counter, Gauge
 from logging import getLogger
 from dateutil.parser import parse
 from urllib.parse import urlparse
+from threading import Lock
+from queue import Queue, Empty
+from io import BytesIO
+from urllib3 import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+import asyncio
 import time
 import ssl
+import os
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:
+    aiohttp = None
 
 logger = getLogger(__name__)
 
+# Methods that are safe to retry
+RETRY_METHODS = ("GET", "PUT", "DELETE")
+
 # prepare for prometheus observations
 prometheus_duration = Histogram('restclient_request_duration_seconds',
                                 'Restclient request duration (seconds)',
@@ -40,6 +73,65 @@ prometheus_timeout = Counter('restclient_request_timeout',
 prometheus_ssl_error = Counter('restclient_request_ssl_error',
                                'Restclient web service SSL error count',
                                ['service'])
+prometheus_pool_services = Gauge('restclient_pool_services',
+                                 'Number of services sharing the '
+                                 'connection pool of a service',
+                                 ['service'])
+prometheus_pool_in_flight = Gauge('restclient_pool_in_flight',
+                                  'Connections checked out of its pool by '
+                                  'a service',
+                                  ['service'])
+prometheus_wire_bytes = Counter('restclient_response_wire_bytes',
+                                'Restclient response body bytes received, '
+                                'before content decoding',
+                                ['service'])
+prometheus_decoded_bytes = Counter('restclient_response_decoded_bytes',
+                                   'Restclient response body bytes, after '
+                                   'content decoding',
+                                   ['service'])
+prometheus_effective_timeout = Gauge('restclient_effective_timeout_seconds',
+                                     'Restclient read timeout used for the '
+                                     'latest request (seconds)',
+                                     ['service'])
+prometheus_circuit_transition = Counter('restclient_circuit_transition',
+                                        'Restclient circuit breaker state '
+                                        'changes, by new state',
+                                        ['service', 'state'])
+prometheus_hedged = Counter('restclient_request_hedged',
+                            'Restclient requests sent again because the '
+                            'first was slow',
+                            ['service'])
+prometheus_hedge_won = Counter('restclient_request_hedge_won',
+                               'Restclient hedged requests that answered '
+                               'before the first request',
+                               ['service'])
+prometheus_in_flight = Gauge('restclient_bulkhead_in_flight',
+                             'Restclient requests in flight, with a '
+                             'concurrency limit',
+                             ['service'])
+prometheus_queued = Gauge('restclient_bulkhead_queued',
+                          'Restclient requests waiting for a turn under '
+                          'the concurrency limit',
+                          ['service'])
+prometheus_shed = Counter('restclient_request_shed',
+                          'Restclient requests refused by the concurrency '
+                          'limit',
+                          ['service'])
+prometheus_rate_limited = Counter('restclient_request_rate_limited',
+                                  'Restclient requests refused by the '
+                                  'service rate limit',
+                                  ['service'])
+prometheus_retry = Counter('restclient_request_retry',
+                           'Restclient web service request retry count',
+                           ['service'])
+prometheus_retry_budget_exhausted = Counter(
+    'restclient_request_retry_budget_exhausted',
+    'Restclient request retries skipped because the retry budget was spent',
+    ['service'])
+prometheus_coalesced = Counter('restclient_request_coalesced',
+                               'Restclient requests served by a concurrent '
+                               'identical request',
+                               ['service'])
 
 
 class DAO(object):
@@ -47,6 +139,14 @@ class DAO(object):
     Base class for per-service interfaces.
     """
     _cache_instance = None
+    _single_flight = SingleFlight()
+    _async_single_flight = AsyncSingleFlight()
+    _refresh_tasks = set()
+    # By DAO class and service, with the settings they were built from
+    _implementation_factories = {}
+    _hedge_budgets = {}
+    _hedge_latencies = {}
+    _service_cache_lock = Lock()
 
     def __init__(self):
         # format is ISO 8601
@@ -112,12 +212,57 @@ class DAO(object):
         """
         return None
 
-    def getURL(self, url, headers={}):
+    def getURL(self, url, headers={}, stream=False):
         """
-        Request a URL using the HTTP method GET
+        Request a URL using the HTTP method GET.
+
+        With stream=True the response body isn't read in advance, or
+        cached.  Read it with response.stream() or response.read(); the
+        connection goes back to the pool once the body has been read, or
+        when response.release_conn() or response.close() is called.  Until
+        then, the request counts against the service's bulkhead.
         """
+        if stream:
+            return self._stream_resource("GET", url, headers, None)
         return self._load_resource("GET", url, headers, None)
 
+    def getURLs(self, urls, headers={}):
+        """
+        Request many URLs using the HTTP method GET, concurrently, using
+        up to the service's POOL_SIZE threads.  Returns a list of responses
+        in the order of urls, with the exception raised in place of the
+        response for any request that failed.  Cached responses are
+        returned without using a thread.
+        """
+        results = [None] * len(urls)
+        tasks = Queue()
+        for index, url in enumerate(urls):
+            try:
+                start_time = time.time()
+                (response, prepared_headers, cache_key,
+                 request_headers) = self._prepare_request(
+                    "GET", url, dict(headers), None, start_time)
+            except Exception as ex:
+                results[index] = ex
+                continue
+
+            if response is not None:
+                results[index] = response
+            else:
+                tasks.put((index, self._send_request, (
+                    "GET", url, prepared_headers, None, cache_key,
+                    request_headers, start_time)))
+
+        workers = min(tasks.qsize(), int(self.get_service_setting(
+            "POOL_SIZE", self.get_setting("DEFAULT_POOL_SIZE", 10))))
+        threads = [QueueThread(tasks, results) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
     def postURL(self, url, headers={}, body=None):
         """
         Request a URL using the HTTP method POST.
@@ -142,6 +287,49 @@ class DAO(object):
         """
         return self._load_resource("DELETE", url, headers, None)
 
+    def warm_up(self, connections=None):
+        """
+        For live services, creates the connection pool and opens
+        keep-alive connections ahead of the first request.  Call this while
+        a worker starts up.  Returns the number of connections opened.
+        """
+        implementation = self.get_implementation()
+        if implementation.is_live():
+            return implementation.warm_up(connections)
+        return 0
+
+    async def agetURL(self, url, headers={}):
+        """
+        Request a URL using the HTTP method GET, from a coroutine.  Live
+        services keep an aiohttp session per event loop, so call
+        LiveDAO.close_async_sessions() before the loop closes.
+        """
+        return await self._aload_resource("GET", url, headers, None)
+
+    async def apostURL(self, url, headers={}, body=None):
+        """
+        Request a URL using the HTTP method POST, from a coroutine.
+        """
+        return await self._aload_resource("POST", url, headers, body)
+
+    async def aputURL(self, url, headers, body=None):
+        """
+        Request a URL using the HTTP method PUT, from a coroutine.
+        """
+        return await self._aload_resource("PUT", url, headers, body)
+
+    async def apatchURL(self, url, headers, body):
+        """
+        Request a URL using the HTTP method PATCH, from a coroutine.
+        """
+        return await self._aload_resource("PATCH", url, headers, body)
+
+    async def adeleteURL(self, url, headers=None):
+        """
+        Request a URL using the HTTP method DELETE, from a coroutine.
+        """
+        return await self._aload_resource("DELETE", url, headers, None)
+
     def service_mock_paths(self):
         """
         If your web service client ships with mock resources, override this
@@ -155,53 +343,337 @@ class DAO(object):
 
     def _load_resource(self, method, url, headers, body):
         start_time = time.time()
+        response, headers, cache_key, request_headers = self._prepare_request(
+            method, url, headers, body, start_time)
+        if response is not None:
+            return response
+
+        return self._send_request(method, url, headers, body, cache_key,
+                                  request_headers, start_time)
+
+    def _stream_resource(self, method, url, headers, body):
+        start_time = time.time()
+        # The body is read by the caller, so a stream is never cached
+        response, headers, _, _ = self._prepare_request(
+            method, url, headers, body, start_time, cacheable=False)
+        if response is not None:
+            return response
+
+        # Timed to the response headers, the body is read by the caller
+        response = self.get_implementation().stream(
+            method, url, headers, body)
+        self._process_response(method, url, headers, body, None, headers,
+                               start_time, response)
+
+        self._log(service=self.service_name(), url=url, method=method,
+                  response=response, cached=False, start_time=start_time)
+
+        return response
+
+    def _send_request(self, method, url, headers, body, cache_key,
+                      request_headers, start_time):
+        if cache_key is not None and self._coalesce_requests():
+            # Share one upstream request among concurrent identical requests
+            (response, cached), coalesced = DAO._single_flight.call(
+                self._get_coalesce_key(cache_key, request_headers),
+                self._fetch_resource, method, url, headers, body, cache_key,
+                request_headers, start_time)
+            if coalesced:
+                self.prometheus_coalesced()
+        else:
+            response, cached = self._fetch_resource(
+                method, url, headers, body, cache_key, request_headers,
+                start_time)
+
+        self._log(service=self.service_name(), url=url, method=method,
+                  response=response, cached=cached, start_time=start_time)
+
+        return response
+
+    async def _aload_resource(self, method, url, headers, body):
+        start_time = time.time()
+        response, headers, cache_key, request_headers = self._prepare_request(
+            method, url, headers, body, start_time,
+            refresh=self._arefresh_cached_response)
+        if response is not None:
+            return response
+
+        if cache_key is not None and self._coalesce_requests():
+            single_flight = DAO._async_single_flight
+            (response, cached), coalesced = await single_flight.call(
+                self._get_coalesce_key(cache_key, request_headers),
+                self._afetch_resource, method, url, headers, body, cache_key,
+                request_headers, start_time)
+            if coalesced:
+                self.prometheus_coalesced()
+        else:
+            response, cached = await self._afetch_resource(
+                method, url, headers, body, cache_key, request_headers,
+                start_time)
+
+        self._log(service=self.service_name(), url=url, method=method,
+                  response=response, cached=cached, start_time=start_time)
+
+        return response
+
+    def _prepare_request(self, method, url, headers, body, start_time,
+                         refresh=None, cacheable=True):
+        """
+        Handles everything before a request is sent to the backend: degraded
+        performance testing, custom headers, and the cache lookup, unless
+        cacheable is False.  A stale cached response is refreshed with
+        refresh (default: _refresh_cached_response).
+
+        Returns a tuple of a response, if there is one already, the headers
+        to send, the cache key (None if the request isn't cacheable), and the
+        original request headers.
+        """
         service = self.service_name()
 
         bad_response = PerformanceDegradation.get_response(service, url)
         if bad_response:
-            return bad_response
+            return bad_response, headers, None, headers
 
         custom_headers = self._custom_headers(method, url, headers, body)
         if custom_headers:
             headers.update(custom_headers)
 
-        is_cacheable = self._is_cacheable(method, url, headers, body)
-
-        cache = self.get_cache()
+        request_headers = headers
+        cache_key = None
 
-        if is_cacheable:
-            cache_response = cache.getCache(service, url, headers)
+        if cacheable and self._is_cacheable(method, url, headers, body):
+            cache_key = self._get_cache_key(url, headers)
+            cache_response = self.get_cache().getCache(
+                service, cache_key, headers)
             if cache_response:
                 if "response" in cache_response:
+                    if "headers" in cache_response:
+                        # A stale response, refresh it for later requests
+                        if refresh is None:
+                            refresh = self._refresh_cached_response
+                        refresh(method, url, cache_response["headers"], body,
+                                cache_key, request_headers)
+
                     self._log(service=service, url=url, method=method,
                               response=cache_response["response"],
                               cached=True, start_time=start_time)
-                    return cache_response["response"]
+                    return (cache_response["response"], headers, cache_key,
+                            request_headers)
                 if "headers" in cache_response:
+                    # Conditional request headers, to revalidate a stale
+                    # cached response
                     headers = cache_response["headers"]
 
+        return None, headers, cache_key, request_headers
+
+    def _fetch_resource(self, method, url, headers, body, cache_key,
+                        request_headers, start_time):
+        """
+        Loads a resource from the backend and, if there is a cache_key,
+        offers it to the cache.  Returns a tuple of the response, and
+        whether the response came from the cache.
+        """
         backend = self.get_implementation()
 
-        response = backend.load(method, url, headers, body)
+        if (method == "GET" and cache_key is not None and
+                self.get_service_setting("HEDGE_REQUESTS", False)):
+            response = self._load_hedged(backend, url, headers)
+        else:
+            response = backend.load(method, url, headers, body)
+        value = self._process_response(method, url, headers, body, cache_key,
+                                       request_headers, start_time, response)
+        if value is None:
+            # The cache asked for revalidation but no longer has the
+            # response body, so make the request unconditionally
+            response = backend.load(method, url, request_headers, body)
+            value = self._process_response(
+                method, url, request_headers, body, cache_key,
+                request_headers, start_time, response)
+        return value
+
+    def _load_hedged(self, backend, url, headers):
+        """
+        Loads a GET, sending it again if there is no response after
+        HEDGE_DELAY seconds (default: the HEDGE_PERCENTILE, default 95, of
+        the service's recent response times), and returns the first
+        response.  Hedges are limited to HEDGE_BUDGET (default: 0.1) of
+        the service's hedgeable requests.  The slower request finishes in
+        the background, and its response is discarded.  Requests are only
+        hedged when threading is enabled.
+        """
+        budget = self._get_hedge_budget()
+        latencies = self._get_hedge_latencies()
+        budget.deposit()
+
+        delay = self.get_service_setting("HEDGE_DELAY", None)
+        if delay is None and len(latencies) >= 20:
+            delay = latencies.percentile(float(
+                self.get_service_setting("HEDGE_PERCENTILE", 95)))
+
+        if delay is None:
+            # Nothing to hedge against yet
+            start_time = time.time()
+            response = backend.load("GET", url, headers, None)
+            latencies.add(time.time() - start_time)
+            return response
+
+        results = Queue()
+
+        def load(hedge):
+            start_time = time.time()
+            try:
+                response = backend.load("GET", url, headers, None)
+            except Exception as ex:
+                results.put((hedge, None, ex))
+            else:
+                latencies.add(time.time() - start_time)
+                results.put((hedge, response, None))
+
+        def start(hedge):
+            thread = GenericPrefetchThread(daemon=True)
+            thread.method = generic_prefetch(load, [hedge])
+            thread.start()
 
+        # Without threading, this loads inline and there is a result
+        # before the delay
+        start(False)
+        attempts = 1
+
+        try:
+            result = results.get(timeout=float(delay))
+        except Empty:
+            result = None
+            if budget.withdraw():
+                start(True)
+                attempts += 1
+                self.prometheus_hedged()
+        if result is None:
+            result = results.get()
+        hedge, response, error = result
+
+        if error is not None and attempts > 1:
+            # The other request may still succeed
+            other = results.get()
+            if other[2] is None:
+                hedge, response, error = other
+
+        if error is not None:
+            raise error
+        if hedge:
+            self.prometheus_hedge_won()
+        return response
+
+    async def _afetch_resource(self, method, url, headers, body, cache_key,
+                               request_headers, start_time):
+        backend = self.get_implementation()
+
+        response = await backend.aload(method, url, headers, body)
+        value = self._process_response(method, url, headers, body, cache_key,
+                                       request_headers, start_time, response)
+        if value is None:
+            response = await backend.aload(method, url, request_headers, body)
+            value = self._process_response(
+                method, url, request_headers, body, cache_key,
+                request_headers, start_time, response)
+        return value
+
+    def _process_response(self, method, url, headers, body, cache_key,
+                          request_headers, start_time, response):
+        """
+        Observes a backend response, and offers it to the cache.  Returns a
+        tuple of the response, and whether it came from the cache, or None
+        if a revalidation request needs to be made unconditionally.
+        """
         self.prometheus_duration(time.time() - start_time)
         self.prometheus_status(response)
 
         self._custom_response_edit(method, url, headers, body, response)
 
-        if is_cacheable:
-            cache_post_response = cache.processResponse(service, url, response)
+        if cache_key is not None:
+            cache_post_response = self._process_cache_response(
+                self.get_cache(), cache_key, response)
             if cache_post_response is not None:
                 if "response" in cache_post_response:
-                    self._log(service=service, url=url, method=method,
-                              response=response, cached=True,
-                              start_time=start_time)
-                    return cache_post_response["response"]
+                    return cache_post_response["response"], True
 
-        self._log(service=service, url=url, method=method, response=response,
-                  cached=False, start_time=start_time)
+            if response.status == 304 and headers is not request_headers:
+                return None
 
-        return response
+        return response, False
+
+    def _get_coalesce_key(self, cache_key, request_headers):
+        return (self.service_name(), cache_key,
+                tuple(sorted(request_headers.items())))
+
+    def _process_cache_response(self, cache, cache_key, response):
+        return process_response(cache, self.service_name(), cache_key,
+                                response, self._get_cache_ttl(response))
+
+    def _get_cache_ttl(self, response):
+        """
+        Returns a cache lifetime (in seconds) for the response, or None to
+        leave it to the cache implementation.
+
+        Responses with a status in _error_status_codes are cached for the
+        NEGATIVE_CACHE_TTL service setting, which defaults to 0 (disabled).
+
+        With the CACHE_CONTROL service setting, 200 responses are cached
+        for as long as their Cache-Control or Expires headers allow, up to
+        the CACHE_CONTROL_MAX_TTL service setting if that is set.  The
+        cache applies the same rule to the merged headers of a 304.
+
+        Those lifetimes are passed to the cache as a ttl keyword argument
+        to processResponse, which the built-in caches accept.  Caches that
+        don't take a ttl keep using their own lifetimes.
+        """
+        status = response.status
+        if status == 200 and self.get_service_setting("CACHE_CONTROL", False):
+            return get_freshness_lifetime(
+                response.headers,
+                self.get_service_setting("CACHE_CONTROL_MAX_TTL", None))
+
+        if (status not in self._ok_status_codes() and
+                status in self._error_status_codes()):
+            negative_ttl = float(self.get_service_setting(
+                "NEGATIVE_CACHE_TTL", 0))
+            if negative_ttl:
+                return negative_ttl
+        return None
+
+    def _refresh_cached_response(self, method, url, headers, body,
+                                 cache_key, request_headers):
+        """
+        Reloads a stale cached resource, in a background thread when
+        threading is enabled.
+        """
+        thread = GenericPrefetchThread()
+        thread.method = generic_prefetch(self._fetch_resource, [
+            method, url, headers, body, cache_key, request_headers,
+            time.time()])
+        thread.start()
+
+    def _arefresh_cached_response(self, method, url, headers, body,
+                                  cache_key, request_headers):
+        """
+        Reloads a stale cached resource in a task on the running event loop.
+        """
+        task = asyncio.get_running_loop().create_task(self._afetch_resource(
+            method, url, headers, body, cache_key, request_headers,
+            time.time()))
+        # The loop only keeps a weak reference to its tasks
+        DAO._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    @staticmethod
+    def _refresh_done(task):
+        DAO._refresh_tasks.discard(task)
+        if not task.cancelled():
+            # Errors in refreshing should also manifest during actual
+            # processing, where they can be handled appropriately
+            task.exception()
+
+    def _coalesce_requests(self):
+        return self.get_service_setting("COALESCE_REQUESTS", False)
 
     def prometheus_duration(self, duration):
         """
@@ -220,6 +692,15 @@ class DAO(object):
         """
         self.prometheus_status_observation(response.status)
 
+    def prometheus_coalesced(self):
+        prometheus_coalesced.labels(self.service_name()).inc()
+
+    def prometheus_hedged(self):
+        prometheus_hedged.labels(self.service_name()).inc()
+
+    def prometheus_hedge_won(self):
+        prometheus_hedge_won.labels(self.service_name()).inc()
+
     def prometheus_duration_observation(self, duration):
         prometheus_duration.labels(self.service_name()).observe(duration)
 
@@ -234,18 +715,84 @@ class DAO(object):
             DAO._cache_instance = self._getModule(implementation, NoCache)
         return DAO._cache_instance
 
-    def clear_cached_response(self, url):
-        self.get_cache().deleteCache(self.service_name(), url)
+    def clear_cached_response(self, url, headers=None):
+        """
+        Removes a cached GET response.  If the service has
+        CACHE_VARY_HEADERS, pass the headers of the cached request.
+        """
+        self.get_cache().deleteCache(self.service_name(),
+                                     self._get_cache_key(url, headers))
+
+    def _get_cache_key(self, url, headers):
+        """
+        Returns the url used to identify a response in the cache.  With the
+        CACHE_KEY_NORMALIZE service setting, equivalent urls share a key.
+        The CACHE_VARY_HEADERS service setting lists request headers that
+        also distinguish responses.
+        """
+        return get_cache_key(
+            url, headers,
+            normalize=self.get_service_setting("CACHE_KEY_NORMALIZE", False),
+            vary_headers=self.get_service_setting("CACHE_VARY_HEADERS", []))
+
+    def _get_hedge_budget(self):
+        return self._get_service_cached(DAO._hedge_budgets,
+                                        self._create_hedge_budget)
+
+    def _create_hedge_budget(self):
+        return RequestBudget(float(self.get_service_setting("HEDGE_BUDGET",
+                                                            0.1)))
+
+    def _get_hedge_latencies(self):
+        return self._get_service_cached(DAO._hedge_latencies,
+                                        self._create_hedge_latencies)
+
+    def _create_hedge_latencies(self):
+        return LatencyWindow(200)
+
+    def _get_service_cached(self, cache, create):
+        """
+        Returns the value of create(), cached in the cache dict by DAO class
+        and service until the service's settings change.
+        """
+        key = (self.__class__, self.service_name())
+        service_settings = get_service_settings(key[1])
+        cached = cache.get(key)
+        if cached is None or cached[0] is not service_settings:
+            value = create()
+            with DAO._service_cache_lock:
+                # Another thread may have created one for these settings
+                cached = cache.get(key)
+                if cached is None or cached[0] is not service_settings:
+                    cached = (service_settings, value)
+                    cache[key] = cached
+        return cached[1]
 
     def get_implementation(self):
+        """
+        Returns a backend for this DAO.  How to create it is worked out
+        once per DAO class, until the service's settings change.
+        """
+        key = (self.__class__, self.service_name())
+        service_settings = get_service_settings(self.service_name())
+        cached = DAO._implementation_factories.get(key)
+        if cached is None or cached[0] is not service_settings:
+            cached = (service_settings, self._get_implementation_factory())
+            DAO._implementation_factories[key] = cached
+        return cached[1](self)
+
+    def _get_implementation_factory(self):
+        """
+        Returns a function that creates a backend for a DAO instance.
+        """
         implementation = self.get_service_setting("DAO_CLASS", None)
 
         # Handle the easy built-ins
         if "Live" == implementation:
-            return self._get_live_implementation()
+            return methodcaller("_get_live_implementation")
 
         if "Mock" == implementation:
-            return self._get_mock_implementation()
+            return methodcaller("_get_mock_implementation")
 
         # Legacy settings support
         live = "restclients.dao_implementation.{}.Live".format(
@@ -254,27 +801,31 @@ class DAO(object):
             self.service_name())
 
         if live == implementation:
-            return self._get_live_implementation()
+            return methodcaller("_get_live_implementation")
 
         if mock == implementation:
-            return self._get_mock_implementation()
+            return methodcaller("_get_mock_implementation")
 
         if implementation:
-            return self._getModule(implementation, None,
-                                   [self.service_name(), self])
+            implementation_class = get_class(implementation)
+            return lambda dao: implementation_class(dao.service_name(), dao)
 
-        return self._get_mock_implementation()
+        return methodcaller("_get_mock_implementation")
 
     def _is_cacheable(self, method, url, headers, body=None):
         if method == "GET":
             return True
         return False
 
-    def _ok_status_codes():
+    def _ok_status_codes(self):
         return [200, 201, 202, 204]
 
-    def _error_status_codes():
-        return []
+    def _error_status_codes(self):
+        """
+        Error statuses that may be cached, when NEGATIVE_CACHE_TTL is set.
+        """
+        return [int(status) for status in self.get_service_setting(
+            "NEGATIVE_CACHE_STATUS_CODES", [404])]
 
     def _get_live_implementation(self):
         return LiveDAO(self.service_name(), self)
@@ -286,33 +837,16 @@ class DAO(object):
         if default is None:
             default = self.get_default_service_setting(key)
 
-        service_key = "{}_{}".format(self.service_name().upper(), key)
-
-        if hasattr(settings, "RESTCLIENTS_{}".format(service_key)):
-            return self.get_setting(service_key, default)
-        else:
-            return self.get_setting(key, default)
+        return get_service_settings(self.service_name()).get(key, default)
 
     def get_setting(self, key, default=None):
-        key = "RESTCLIENTS_{}".format(key)
-        return getattr(settings, key, default)
+        return get_service_settings().get(key, default)
 
     def _getModule(self, value, default_class, args=[]):
         if not value:
             return default_class()
 
-        module, attr = value.rsplit('.', 1)
-        try:
-            mod = import_module(module)
-        except ImportError as e:
-            raise ImproperlyConfigured(
-                "Error importing module {}: {}".format(module, e))
-        try:
-            config_module = getattr(mod, attr)
-        except AttributeError:
-            raise ImproperlyConfigured(
-                "Module {} missing {} class".format(module, attr))
-        return config_module(*args)
+        return get_class(value)(*args)
 
     def _log(self, *args, **kwargs):
         if not self.should_log():
@@ -345,6 +879,19 @@ class DAO(object):
         return True
 
 
+def _no_bulkhead():
+    pass
+
+
+def _prometheus_circuit_transition(service, state):
+    prometheus_circuit_transition.labels(service, state).inc()
+
+
+def _prometheus_bulkhead(service, in_flight, queued):
+    prometheus_in_flight.labels(service).set(in_flight)
+    prometheus_queued.labels(service).set(queued)
+
+
 class DAOImplementation(object):
     def __init__(self, service_name, dao):
         self._service_name = service_name
@@ -356,46 +903,423 @@ class DAOImplementation(object):
     def is_mock(self):
         return False
 
+    async def aload(self, method, url, headers, body):
+        """
+        Loads a response from a coroutine.  Implementations that can't
+        do their I/O asynchronously load it inline.
+        """
+        return self.load(method, url, headers, body)
+
+    def stream(self, method, url, headers, body):
+        """
+        Loads a response without reading its body.  Implementations that
+        don't stream return a loaded response.
+        """
+        return self.load(method, url, headers, body)
+
 
 class LiveDAO(DAOImplementation):
     """
     Loads response objects by fetching resources from an HTTP(s) server.
     """
     pools = {}
+    shared_pools = {}
+    # The POOL_SIZE of each service using a pool key, and their sum
+    pool_services = {}
+    pool_sizes = {}
+    _pool_lock = Lock()
+    # aiohttp sessions for async requests, by event loop and pool key
+    async_sessions = {}
+    # By DAO class and service, with the settings they were built from
+    pool_kwargs = {}
+    pool_keys = {}
+    # Recent response times, for adaptive timeouts
+    latencies = {}
+    circuit_breakers = {}
+    retry_budgets = {}
+    rate_limiters = {}
+    bulkheads = {}
 
     def is_live(self):
         return True
 
     def load(self, method, url, headers, body):
+        self._deposit_retry_budget()
+        attempt = 0
+        while True:
+            try:
+                response = self._urlopen(method, url, headers, body)
+                if not (self._is_retry_status(response.status) and
+                        self._can_retry(method, attempt)):
+                    break
+            except (CircuitOpenException, RateLimitException,
+                    BulkheadFullException):
+                raise
+            except DataFailureException:
+                if not self._can_retry(method, attempt):
+                    raise
+
+            time.sleep(self._get_retry_delay(attempt))
+            attempt += 1
+
+        self._prometheus_bytes(response.tell(), len(response.data or b""))
+        return response
+
+    def stream(self, method, url, headers, body):
+        # The response keeps the connection until its body has been read,
+        # then releases it to the pool
+        return self._urlopen(method, url, headers, body, stream=True)
+
+    def _urlopen(self, method, url, headers, body, stream=False):
         pool = self.get_pool()
         timeout = pool.timeout
+        read_timeout = self._get_request_timeout(timeout.read_timeout)
+        if read_timeout != timeout.read_timeout:
+            timeout = Timeout(connect=timeout.connect_timeout,
+                              read=read_timeout)
+
+        # Fail fast while the circuit is open, without using up a token
+        circuit_breaker = self._check_circuit_breaker(url)
+        wait = self._check_rate_limit(url, circuit_breaker)
+        if wait:
+            time.sleep(wait)
+
+        # Only requests ready to be sent take a bulkhead turn
+        release_bulkhead = self._acquire_bulkhead(url, circuit_breaker,
+                                                  block=True)
+        failed = True
+        in_flight = prometheus_pool_in_flight.labels(self.dao.service_name())
+        in_flight.inc()
+        streaming = False
+        start_time = time.time()
+
+        def release():
+            in_flight.dec()
+            release_bulkhead()
+
         try:
-            return pool.urlopen(
-                method, url, body=body, headers=headers,
-                timeout=timeout,
-                pool_timeout=timeout.connect_timeout)
+            kwargs = dict(body=body,
+                          headers=self._get_request_headers(headers),
+                          timeout=timeout,
+                          pool_timeout=timeout.connect_timeout,
+                          preload_content=not stream,
+                          release_conn=not stream)
+            try:
+                response = pool.urlopen(method, url, **kwargs)
+            except ClosedPoolError:
+                # Replaced by a larger shared pool since get_pool()
+                response = self.get_pool().urlopen(method, url, **kwargs)
             # will block for 1 sec if no connection is available
             # then raise EmptyPoolError
+            self._add_latency(time.time() - start_time)
+            failed = response.status >= 500
+            if stream:
+                # A streamed response keeps its turn until its body is read
+                self._on_release(response, release)
+                streaming = True
+            return response
         except ssl.SSLError as err:
             self._prometheus_ssl_error()
             raise
         except HTTPError as err:
+            if isinstance(err, MaxRetryError):
+                timed_out = isinstance(err.reason, ReadTimeoutError)
+            else:
+                timed_out = isinstance(err, ReadTimeoutError)
+            if timed_out:
+                self._add_timeout_latency(start_time, timeout.read_timeout)
             status = 0
             self._prometheus_timeout()
             raise DataFailureException(url, status, err)
+        finally:
+            if not streaming:
+                release()
+            self._record_circuit_result(circuit_breaker, failed)
+
+    def _on_release(self, response, callback):
+        """
+        Calls callback once the connection of a streamed response is
+        released to the pool, or closed.
+        """
+        release_conn = response.release_conn
+        close = response.close
+        released = []
+
+        def on_release():
+            if not released:
+                released.append(True)
+                callback()
+
+        def release_response_conn():
+            release_conn()
+            on_release()
+
+        def close_response():
+            close()
+            on_release()
+
+        # urllib3 calls self.release_conn() once the body has been read
+        response.release_conn = release_response_conn
+        response.close = close_response
+
+    async def aload(self, method, url, headers, body):
+        self._deposit_retry_budget()
+        attempt = 0
+        while True:
+            try:
+                response = await self._aurlopen(method, url, headers, body)
+                if not (self._is_retry_status(response.status) and
+                        self._can_retry(method, attempt)):
+                    return response
+            except (CircuitOpenException, RateLimitException,
+                    BulkheadFullException):
+                raise
+            except DataFailureException:
+                if not self._can_retry(method, attempt):
+                    raise
+
+            await asyncio.sleep(self._get_retry_delay(attempt))
+            attempt += 1
+
+    async def _aurlopen(self, method, url, headers, body):
+        session = self.get_async_session()
+        host, kwargs = self._get_pool_kwargs()
+        parsed = urlparse(host)
+        # Like urlopen, url is the path on the host, sent as is
+        full_url = yarl.URL("{}://{}{}".format(
+            parsed.scheme, parsed.netloc, url), encoded=True)
+
+        timeout = kwargs["timeout"]
+        read_timeout = self._get_request_timeout(timeout.read_timeout)
+
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        circuit_breaker = self._check_circuit_breaker(url)
+        wait = self._check_rate_limit(url, circuit_breaker)
+        if wait:
+            await asyncio.sleep(wait)
+
+        # Waiting for a turn would block the event loop
+        release_bulkhead = self._acquire_bulkhead(url, circuit_breaker,
+                                                  block=False)
+        failed = True
+        in_flight = prometheus_pool_in_flight.labels(self.dao.service_name())
+        in_flight.inc()
+        start_time = time.time()
+        try:
+            # aiohttp counts the final response as a redirect
+            async with session.request(
+                    method, full_url,
+                    headers=self._get_request_headers(headers), data=body,
+                    max_redirects=kwargs["retries"].redirect + 1,
+                    timeout=aiohttp.ClientTimeout(
+                        sock_connect=timeout.connect_timeout,
+                        sock_read=read_timeout)) as response:
+                data = await response.read()
+                self._add_latency(time.time() - start_time)
+                failed = response.status >= 500
+                response_headers = HTTPHeaderDict()
+                for name, value in response.headers.items():
+                    response_headers.add(name, value)
+        except aiohttp.ClientSSLError as err:
+            self._prometheus_ssl_error()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            if (isinstance(err, aiohttp.ServerTimeoutError) and
+                    not isinstance(err, getattr(
+                        aiohttp, "ConnectionTimeoutError", ()))):
+                self._add_timeout_latency(start_time, read_timeout)
+            status = 0
+            self._prometheus_timeout()
+            raise DataFailureException(url, status, err)
+        finally:
+            in_flight.dec()
+            release_bulkhead()
+            self._record_circuit_result(circuit_breaker, failed)
+
+        # Same response type, and content decoding, as the sync backend
+        response = HTTPResponse(
+            body=BytesIO(data), headers=response_headers,
+            status=response.status, reason=response.reason,
+            preload_content=True, decode_content=True, request_url=url)
+        self._prometheus_bytes(len(data), len(response.data))
+        return response
+
+    def _get_request_headers(self, headers):
+        """
+        Adds the service's ACCEPT_ENCODING setting (default: the encodings
+        urllib3 can decode) as an Accept-Encoding header, unless the request
+        already has one.  Responses are decoded transparently.
+        """
+        accept_encoding = self.dao.get_service_setting(
+            "ACCEPT_ENCODING", ACCEPT_ENCODING)
+        if (not accept_encoding or
+                get_header(headers, "Accept-Encoding") is not None):
+            return headers
+
+        headers = dict(headers or {})
+        headers["Accept-Encoding"] = accept_encoding
+        return headers
+
+    def get_async_session(self):
+        """
+        Returns the aiohttp session for the running event loop.  Services
+        that would share a connection pool share a session.  Sessions stay
+        open until close_async_sessions() is called from the loop.
+        """
+        if aiohttp is None:
+            raise ImproperlyConfigured(
+                "Async requests need aiohttp, see the 'async' extra")
+
+        loop = asyncio.get_running_loop()
+        sessions = LiveDAO.async_sessions.get(loop)
+        if sessions is None:
+            # Forget loops that were closed without close_async_sessions()
+            for closed_loop in list(LiveDAO.async_sessions):
+                if closed_loop.is_closed():
+                    LiveDAO.async_sessions.pop(closed_loop, None)
+            sessions = LiveDAO.async_sessions.setdefault(loop, {})
+
+        pool_key = self._get_pool_key()
+        if self.dao.service_name() not in LiveDAO.pool_services.get(
+                pool_key, ()):
+            with LiveDAO._pool_lock:
+                self._join_pool(pool_key)
+
+        # A service joining the pool key gets a new, larger session.
+        # Requests in flight finish on the old one, which is closed with
+        # the others.
+        maxsize = LiveDAO.pool_sizes[pool_key]
+        session = sessions.get((pool_key, maxsize))
+        if session is None or session.closed:
+            session = self.create_async_session(maxsize)
+            sessions[(pool_key, maxsize)] = session
+        return session
+
+    def create_async_session(self, maxsize=None):
+        host, kwargs = self._get_pool_kwargs()
+        timeout = kwargs["timeout"]
+        if maxsize is None:
+            maxsize = kwargs["maxsize"]
+
+        connector = aiohttp.TCPConnector(
+            limit=maxsize, ssl=kwargs.get("ssl_context"))
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=timeout.connect_timeout,
+                sock_read=timeout.read_timeout),
+            auto_decompress=False,
+            skip_auto_headers=("Accept-Encoding", "Content-Type"))
+
+    @staticmethod
+    async def close_async_sessions():
+        """
+        Closes the aiohttp sessions of the running event loop.  They aren't
+        closed automatically, so call this before closing the loop, e.g. at
+        the end of the coroutine passed to asyncio.run().
+        """
+        sessions = LiveDAO.async_sessions.pop(
+            asyncio.get_running_loop(), {})
+        for session in sessions.values():
+            await session.close()
 
     def get_pool(self):
         service = self.dao.service_name()
-        if service not in LiveDAO.pools:
-            pool = self.create_pool()
+        pool = LiveDAO.pools.get(service)
+        if pool is not None:
+            return pool
+
+        with LiveDAO._pool_lock:
+            # Another thread may have created it while this one waited
+            if service in LiveDAO.pools:
+                return LiveDAO.pools[service]
+
+            pool_key = self._get_pool_key()
+            maxsize = self._join_pool(pool_key)
+
+            pool = LiveDAO.shared_pools.get(pool_key)
+            if pool is None or pool.pool.maxsize < maxsize:
+                # A pool with room for every service using it.  Closing the
+                # smaller pool lets requests in flight on it finish, and
+                # closes their connections when they are released.
+                old_pool = pool
+                pool = self.create_pool(maxsize)
+                LiveDAO.shared_pools[pool_key] = pool
+                for pool_service in LiveDAO.pool_services[pool_key]:
+                    if pool_service in LiveDAO.pools:
+                        LiveDAO.pools[pool_service] = pool
+                if old_pool is not None:
+                    old_pool.close()
+
             LiveDAO.pools[service] = pool
 
-        return LiveDAO.pools[service]
+        return pool
+
+    def _join_pool(self, pool_key):
+        """
+        Adds the service to the services using pool_key, and returns their
+        total POOL_SIZE.  Call with LiveDAO._pool_lock held.
+        """
+        services = LiveDAO.pool_services.setdefault(pool_key, {})
+        services[self.dao.service_name()] = self._get_max_pool_size()
+        LiveDAO.pool_sizes[pool_key] = sum(services.values())
+
+        for pool_service in services:
+            prometheus_pool_services.labels(pool_service).set(len(services))
+        return LiveDAO.pool_sizes[pool_key]
 
-    def create_pool(self):
+    def warm_up(self, connections=None):
+        """
+        Creates the service's pool, and opens up to `connections` (default:
+        the POOL_WARM_CONNECTIONS service setting, or 1) keep-alive
+        connections, so the first requests don't pay for the TCP and TLS
+        handshakes.  Returns the number of connections opened.
+        """
+        pool = self.get_pool()
+        if connections is None:
+            connections = int(self.dao.get_service_setting(
+                "POOL_WARM_CONNECTIONS", 1))
+        connections = min(connections, pool.pool.maxsize)
+
+        # Check out distinct connections, then return them all to the pool
+        conns = []
+        opened = 0
+        try:
+            for i in range(connections):
+                conn = pool._get_conn(timeout=pool.timeout.connect_timeout)
+                conns.append(conn)
+                if conn.sock is None:
+                    conn.connect()
+                    opened += 1
+        except (HTTPError, OSError) as ex:
+            logger.warning("Pool warm up failed for {}: {}".format(
+                self.dao.service_name(), ex))
+        finally:
+            for conn in conns:
+                pool._put_conn(conn)
+
+        return opened
+
+    def create_pool(self, maxsize=None):
         """
         Return a ConnectionPool instance of given host
         """
+        host, kwargs = self._get_pool_kwargs()
+        if maxsize is not None:
+            kwargs = dict(kwargs, maxsize=maxsize)
+        return connection_from_url(host, **kwargs)
+
+    def _get_pool_kwargs(self):
+        """
+        Returns the host and connection pool arguments of the service.  The
+        returned kwargs are shared, and must not be changed.
+        """
+        return self.dao._get_service_cached(LiveDAO.pool_kwargs,
+                                            self._create_pool_kwargs)
+
+    def _create_pool_kwargs(self):
         ca_certs = self.dao.get_setting("CA_BUNDLE",
                                         "/etc/ssl/certs/ca-bundle.crt")
         cert_file = self.dao.get_service_setting("CERT_FILE", None)
@@ -430,10 +1354,62 @@ class LiveDAO(DAOImplementation):
             else:
                 kwargs["cert_reqs"] = "CERT_NONE"
 
-            if ssl_context is not None:
-                kwargs["ssl_context"] = ssl_context
+            if ssl_context is None:
+                ssl_context = self._get_shared_ssl_context(kwargs)
+            kwargs["ssl_context"] = ssl_context
 
-        return connection_from_url(host, **kwargs)
+        return host, kwargs
+
+    def _get_shared_ssl_context(self, kwargs):
+        """
+        Moves the TLS settings in kwargs into a shared SSLContext.  Files
+        that don't exist are left for urllib3 to report when connecting.
+        """
+        files = {}
+        for name in ("ca_certs", "cert_file", "key_file"):
+            path = kwargs.get(name)
+            if path is not None and os.path.exists(path):
+                files[name] = kwargs.pop(name)
+
+        if "cert_file" in kwargs or "key_file" in kwargs:
+            files.pop("cert_file", None)
+            files.pop("key_file", None)
+
+        return get_ssl_context(kwargs.pop("ssl_version"), kwargs["cert_reqs"],
+                               **files)
+
+    def _get_pool_key(self):
+        """
+        With their SHARE_POOL setting, services whose pools would connect
+        to the same host with the same settings share a pool, sized to the
+        sum of their POOL_SIZE settings.
+        """
+        return self.dao._get_service_cached(LiveDAO.pool_keys,
+                                            self._create_pool_key)
+
+    def _create_pool_key(self):
+        if not self.dao.get_service_setting("SHARE_POOL", False):
+            return (self.dao.service_name(),)
+
+        host, kwargs = self._get_pool_kwargs()
+        parsed = urlparse(host)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+
+        options = []
+        for name, value in sorted(kwargs.items()):
+            if name == "maxsize":
+                continue
+            if isinstance(value, Timeout):
+                value = (value.connect_timeout, value.read_timeout)
+            elif isinstance(value, Retry):
+                value = (value.total, value.connect, value.read,
+                         value.redirect)
+            elif name == "ssl_context":
+                value = id(value)
+            options.append((name, value))
+
+        return (self.__class__, parsed.scheme, parsed.hostname, port,
+                tuple(options))
 
     def _get_connect_timeout(self):
         """
@@ -451,6 +1427,218 @@ class LiveDAO(DAOImplementation):
         return float(self.dao.get_service_setting("TIMEOUT",
                      self.dao.get_setting("DEFAULT_TIMEOUT", 10)))
 
+    def _get_request_timeout(self, timeout):
+        """
+        The read timeout for a request.  With the service's ADAPTIVE_TIMEOUT
+        setting, this is ADAPTIVE_TIMEOUT_MULTIPLIER (default: 3) times the
+        ADAPTIVE_TIMEOUT_PERCENTILE (default: 99) of the service's recent
+        response times, bounded by ADAPTIVE_TIMEOUT_MIN (default: 1) and
+        ADAPTIVE_TIMEOUT_MAX (default: the TIMEOUT setting).  Until
+        ADAPTIVE_TIMEOUT_MIN_SAMPLES (default: 20) responses have been
+        seen, the TIMEOUT setting is used.
+        """
+        if self.dao.get_service_setting("ADAPTIVE_TIMEOUT", False):
+            latencies = self._get_latencies()
+            min_samples = int(self.dao.get_service_setting(
+                "ADAPTIVE_TIMEOUT_MIN_SAMPLES", 20))
+
+            if len(latencies) >= max(min_samples, 1):
+                latency = latencies.percentile(float(
+                    self.dao.get_service_setting(
+                        "ADAPTIVE_TIMEOUT_PERCENTILE", 99)))
+                multiplier = float(self.dao.get_service_setting(
+                    "ADAPTIVE_TIMEOUT_MULTIPLIER", 3))
+                minimum = float(self.dao.get_service_setting(
+                    "ADAPTIVE_TIMEOUT_MIN", 1))
+                maximum = float(self.dao.get_service_setting(
+                    "ADAPTIVE_TIMEOUT_MAX", timeout))
+                timeout = min(max(latency * multiplier, minimum), maximum)
+
+        prometheus_effective_timeout.labels(
+            self.dao.service_name()).set(timeout)
+        return timeout
+
+    def _get_latencies(self):
+        return self.dao._get_service_cached(LiveDAO.latencies,
+                                            self._create_latencies)
+
+    def _create_latencies(self):
+        return LatencyWindow(int(self.dao.get_service_setting(
+            "ADAPTIVE_TIMEOUT_WINDOW", 200)))
+
+    def _add_latency(self, seconds):
+        if self.dao.get_service_setting("ADAPTIVE_TIMEOUT", False):
+            self._get_latencies().add(seconds)
+
+    def _add_timeout_latency(self, start_time, timeout):
+        """
+        Records a read timeout as a response time of at least the timeout,
+        so the adaptive timeout grows when the service slows down.
+        """
+        self._add_latency(max(time.time() - start_time, timeout))
+
+    def _acquire_bulkhead(self, url, circuit_breaker=None, block=True):
+        """
+        With the service's BULKHEAD_MAX_CONCURRENT setting, limits its
+        in-flight requests.  Up to BULKHEAD_MAX_QUEUED (default: 0) more
+        requests wait up to BULKHEAD_TIMEOUT (default: 1) seconds for a
+        turn, if block is True, and the rest raise BulkheadFullException,
+        cancelling the request the circuit_breaker allowed.  Returns a
+        function that gives the turn back.
+        """
+        max_concurrent = self.dao.get_service_setting(
+            "BULKHEAD_MAX_CONCURRENT", None)
+        if not max_concurrent:
+            return _no_bulkhead
+
+        bulkhead = self.dao._get_service_cached(LiveDAO.bulkheads,
+                                                self._create_bulkhead)
+        timeout = 0
+        if block:
+            timeout = float(self.dao.get_service_setting(
+                "BULKHEAD_TIMEOUT", 1))
+
+        if not bulkhead.acquire(timeout):
+            if circuit_breaker is not None:
+                circuit_breaker.cancel_request()
+            self._prometheus_shed()
+            raise BulkheadFullException(
+                url, 0, "Too many concurrent requests to {}".format(
+                    self.dao.service_name()))
+        return bulkhead.release
+
+    def _create_bulkhead(self):
+        # Metrics are updated through the service name, so the bulkhead
+        # doesn't keep this LiveDAO alive
+        return Bulkhead(
+            int(self.dao.get_service_setting("BULKHEAD_MAX_CONCURRENT")),
+            int(self.dao.get_service_setting("BULKHEAD_MAX_QUEUED", 0)),
+            on_change=partial(_prometheus_bulkhead, self.dao.service_name()))
+
+    def _check_rate_limit(self, url, circuit_breaker=None):
+        """
+        With the service's RATE_LIMIT setting (requests per second),
+        returns the number of seconds to wait before making a request.
+        Bursts of up to RATE_LIMIT_BURST (default: RATE_LIMIT) requests are
+        allowed.  Requests wait for up to RATE_LIMIT_TIMEOUT (default: 5)
+        seconds, or raise RateLimitException straight away if
+        RATE_LIMIT_BLOCK is False.  The request the circuit_breaker allowed
+        is cancelled if it raises.
+        """
+        rate = self.dao.get_service_setting("RATE_LIMIT", None)
+        if not rate:
+            return 0
+
+        rate_limiter = self._get_rate_limiter()
+        timeout = 0
+        if self.dao.get_service_setting("RATE_LIMIT_BLOCK", True):
+            timeout = float(self.dao.get_service_setting(
+                "RATE_LIMIT_TIMEOUT", 5))
+
+        wait = rate_limiter.reserve(timeout)
+        if wait is None:
+            if circuit_breaker is not None:
+                circuit_breaker.cancel_request()
+            self._prometheus_rate_limited()
+            raise RateLimitException(
+                url, 0, "Rate limit exceeded for {}".format(
+                    self.dao.service_name()))
+        return wait
+
+    def _get_rate_limiter(self):
+        return self.dao._get_service_cached(LiveDAO.rate_limiters,
+                                            self._create_rate_limiter)
+
+    def _create_rate_limiter(self):
+        burst = self.dao.get_service_setting("RATE_LIMIT_BURST", None)
+        return RateLimiter(float(self.dao.get_service_setting("RATE_LIMIT")),
+                           float(burst) if burst else None)
+
+    def _check_circuit_breaker(self, url):
+        """
+        With the service's CIRCUIT_BREAKER setting, returns the service's
+        circuit breaker, or raises CircuitOpenException if it won't allow a
+        request.  The circuit opens after CIRCUIT_BREAKER_FAILURES
+        (default: 5) consecutive connection errors, timeouts or 5xx
+        responses, and lets CIRCUIT_BREAKER_HALF_OPEN_REQUESTS (default: 1)
+        requests through after CIRCUIT_BREAKER_RESET_TIMEOUT (default: 30)
+        seconds.
+        """
+        if not self.dao.get_service_setting("CIRCUIT_BREAKER", False):
+            return None
+
+        circuit_breaker = self.dao._get_service_cached(
+            LiveDAO.circuit_breakers, self._create_circuit_breaker)
+        if not circuit_breaker.allow_request():
+            raise CircuitOpenException(
+                url, 0, "Circuit breaker open for {}".format(
+                    self.dao.service_name()))
+        return circuit_breaker
+
+    def _create_circuit_breaker(self):
+        return CircuitBreaker(
+            int(self.dao.get_service_setting("CIRCUIT_BREAKER_FAILURES", 5)),
+            float(self.dao.get_service_setting(
+                "CIRCUIT_BREAKER_RESET_TIMEOUT", 30)),
+            int(self.dao.get_service_setting(
+                "CIRCUIT_BREAKER_HALF_OPEN_REQUESTS", 1)),
+            on_transition=partial(_prometheus_circuit_transition,
+                                  self.dao.service_name()))
+
+    def _record_circuit_result(self, circuit_breaker, failed):
+        if circuit_breaker is None:
+            return
+        if failed:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+
+    def _deposit_retry_budget(self):
+        if int(self.dao.get_service_setting("RETRIES", 0)) > 0:
+            self._get_retry_budget().deposit()
+
+    def _get_retry_budget(self):
+        return self.dao._get_service_cached(LiveDAO.retry_budgets,
+                                            self._create_retry_budget)
+
+    def _create_retry_budget(self):
+        return RequestBudget(float(self.dao.get_service_setting(
+            "RETRY_BUDGET", 0.2)))
+
+    def _can_retry(self, method, attempt):
+        """
+        Idempotent requests that fail with a connection error, a timeout
+        or a RETRY_STATUS_CODES (default: 502, 503, 504) response are
+        retried up to the service's RETRIES (default: 0) times.  Retries
+        are limited to RETRY_BUDGET (default: 0.2) of the service's
+        requests, so they can't multiply the load on a failing service.
+        """
+        retries = int(self.dao.get_service_setting("RETRIES", 0))
+        if attempt >= retries or method not in RETRY_METHODS:
+            return False
+
+        if not self._get_retry_budget().withdraw():
+            self._prometheus_retry_budget_exhausted()
+            return False
+
+        self._prometheus_retry()
+        return True
+
+    def _is_retry_status(self, status):
+        return status in self.dao.get_service_setting(
+            "RETRY_STATUS_CODES", [502, 503, 504])
+
+    def _get_retry_delay(self, attempt):
+        """
+        Exponential backoff with full jitter: a random delay of up to
+        RETRY_BACKOFF (default: 0.1) seconds, doubling with each attempt,
+        capped at RETRY_BACKOFF_MAX (default: 2) seconds.
+        """
+        backoff = float(self.dao.get_service_setting("RETRY_BACKOFF", 0.1))
+        backoff_max = float(self.dao.get_service_setting(
+            "RETRY_BACKOFF_MAX", 2))
+        return random.uniform(0, min(backoff_max, backoff * 2 ** attempt))
+
     def _get_max_pool_size(self):
         """
         The maximum connections per host.
@@ -464,6 +1652,24 @@ class LiveDAO(DAOImplementation):
     def _prometheus_ssl_error(self):
         prometheus_ssl_error.labels(self.dao.service_name()).inc()
 
+    def _prometheus_shed(self):
+        prometheus_shed.labels(self.dao.service_name()).inc()
+
+    def _prometheus_rate_limited(self):
+        prometheus_rate_limited.labels(self.dao.service_name()).inc()
+
+    def _prometheus_retry(self):
+        prometheus_retry.labels(self.dao.service_name()).inc()
+
+    def _prometheus_retry_budget_exhausted(self):
+        prometheus_retry_budget_exhausted.labels(
+            self.dao.service_name()).inc()
+
+    def _prometheus_bytes(self, wire_bytes, decoded_bytes):
+        service = self.dao.service_name()
+        prometheus_wire_bytes.labels(service).inc(wire_bytes)
+        prometheus_decoded_bytes.labels(service).inc(decoded_bytes)
+
 
 class MockDAO(DAOImplementation):
     """
@@ -25,6 +25,30 @@ class DataFailureException(Exception):
                 self.url, self.status, self.msg))
 
 
+class CircuitOpenException(DataFailureException):
+    """
+    Raised instead of making a request to a service whose circuit breaker
+    is open, because its recent requests have failed.
+    """
+    pass
+
+
+class RateLimitException(DataFailureException):
+    """
+    Raised instead of making a request that would exceed a service's
+    RATE_LIMIT.
+    """
+    pass
+
+
+class BulkheadFullException(DataFailureException):
+    """
+    Raised instead of making a request when a service already has its
+    BULKHEAD_MAX_CONCURRENT requests in flight, and no room to queue.
+    """
+    pass
+
+
 class InvalidRegID(Exception):
     """Exception for invalid regid."""
     pass
@@ -30,6 +30,18 @@ class MockHTTP(object):
         """
         return self.data
 
+    def stream(self, amt=2**16):
+        """
+        Yields the document body in chunks of up to amt bytes, like
+        HTTPResponse.stream().
+        """
+        data = self.data
+        for start in range(0, len(data), amt):
+            yield data[start:start + amt]
+
+    def release_conn(self):
+        pass
+
     def getheader(self, field, default=''):
         """
         Returns the HTTP response header field, case insensitively
@@ -54,6 +66,26 @@ class CacheHTTP(MockHTTP):
         return self.cache_class
 
 
+class MappedCacheHTTP(CacheHTTP):
+    """
+    A cached response whose body stays in a memory-mapped file until it is
+    read.
+    """
+    def __init__(self, body, encoding=None):
+        self._body = body
+        self._encoding = encoding
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            data = bytes(self._body)
+            if self._encoding is not None:
+                data = data.decode(self._encoding)
+            self._data = data
+        return self._data
+
+
 class Model(object):
     initialized = False
 
@@ -6,7 +6,14 @@ from commonconf import override_settings
 from restclients_core.dao import DAO, MockDAO
 from restclients_core.cache import NoCache
 from restclients_core.models import MockHTTP, CacheHTTP
-from restclients_core.exceptions import ImproperlyConfigured
+from restclients_core.exceptions import (
+    ImproperlyConfigured, DataFailureException)
+from threading import current_thread, Lock
+import asyncio
+import gc
+import mock
+import time
+import weakref
 
 
 class TDAO(DAO):
@@ -33,6 +40,19 @@ class E2DAO(TDAO):
                     'test_backend.BackendX')
 
 
+class E3DAO(TDAO):
+    pass
+
+
+class PathDAO(TDAO):
+    def __init__(self, path):
+        self.path = path
+        super().__init__()
+
+    def service_mock_paths(self):
+        return [self.path]
+
+
 class TCache():
     def getCache(self, service, url, headers):
         if url == '/ok':
@@ -72,12 +92,122 @@ class TestBackend(TestCase):
         response = TDAO().patchURL('/ok', {}, '')
         self.assertEqual(response.data, 'ok - PATCH')
 
+    def test_async(self):
+        dao = TDAO()
+        response = asyncio.run(dao.agetURL('/ok'))
+        self.assertEqual(response.data, 'ok - GET')
+
+        response = asyncio.run(dao.apostURL('/ok'))
+        self.assertEqual(response.data, 'ok - POST')
+
+        response = asyncio.run(dao.aputURL('/ok', {}, ''))
+        self.assertEqual(response.data, 'ok - PUT')
+
+        response = asyncio.run(dao.apatchURL('/ok', {}, ''))
+        self.assertEqual(response.data, 'ok - PATCH')
+
+        response = asyncio.run(dao.adeleteURL('/ok'))
+        self.assertEqual(response.data, 'ok - DELETE')
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           'restclients_core.tests.dao_implementation.'
+                           'test_backend.TCache'))
+    def test_async_cache(self):
+        response = asyncio.run(TDAO().agetURL('/ok'))
+        self.assertEqual(response.cache_class, TCache)
+        self.assertEqual(response.data, 'ok - GET')
+
+        response = asyncio.run(TDAO().agetURL('/ok2'))
+        self.assertEqual(response.cache_class, TCache)
+        self.assertEqual(response.status, 404)
+
+    def test_stream(self):
+        response = TDAO().getURL('/ok', stream=True)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(list(response.stream(4)), ['ok -', ' GET'])
+        response.release_conn()
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           'restclients_core.tests.dao_implementation.'
+                           'test_backend.TCache'))
+    def test_stream_not_cached(self):
+        response = TDAO().getURL('/ok', stream=True)
+        self.assertNotIsInstance(response, CacheHTTP)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(list(response.stream(4)), ['ok -', ' GET'])
+        response.release_conn()
+
+    def test_get_urls(self):
+        responses = TDAO().getURLs(['/ok', '/error', '/other'])
+        self.assertEqual(len(responses), 3)
+        self.assertEqual(responses[0].data, 'ok - GET')
+        self.assertIsInstance(responses[1], DataFailureException)
+        self.assertEqual(responses[1].url, '/error')
+        self.assertEqual(responses[2].data, 'ok - GET')
+
+        self.assertEqual(TDAO().getURLs([]), [])
+
+    @override_settings(RESTCLIENTS_USE_THREADING=True,
+                       RESTCLIENTS_BACKEND_TEST_POOL_SIZE=3)
+    def test_get_urls_threaded(self):
+        SlowBackend.reset()
+        urls = ['/{}'.format(i) for i in range(10)]
+        responses = SlowDAO().getURLs(urls)
+
+        self.assertEqual([r.data for r in responses], urls)
+        self.assertEqual(SlowBackend.max_running, 3)
+        self.assertEqual(len(SlowBackend.threads), 3)
+        self.assertNotIn(current_thread(), SlowBackend.threads)
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           'restclients_core.tests.dao_implementation.'
+                           'test_backend.TCache'))
+    def test_get_urls_cached(self):
+        with mock.patch('restclients_core.dao.QueueThread') as mock_thread:
+            responses = TDAO().getURLs(['/ok', '/ok'])
+            self.assertEqual(mock_thread.call_count, 0)
+        for response in responses:
+            self.assertEqual(response.cache_class, TCache)
+
     def test_error_level1(self):
         self.assertRaises(ImproperlyConfigured, E1DAO().getURL, '/ok')
 
     def test_error_level2(self):
         self.assertRaises(ImproperlyConfigured, E2DAO().getURL, '/ok')
 
+    def test_implementation_resolved_once(self):
+        TDAO().get_implementation()
+        with mock.patch("restclients_core.dao.get_class") as mock_get_class:
+            backend = TDAO().get_implementation()
+            TDAO().getURL('/ok')
+            self.assertEqual(mock_get_class.call_count, 0)
+        self.assertIsInstance(backend, Backend)
+
+        E3DAO().get_implementation()
+        self.assertEqual(len([key for key in DAO._implementation_factories
+                              if key[0] in (TDAO, E3DAO)]), 2)
+
+    def test_implementation_instances(self):
+        dao_a = PathDAO("/a")
+        self.assertIs(dao_a.get_implementation().dao, dao_a)
+
+        dao_b = PathDAO("/b")
+        backend = dao_b.get_implementation()
+        self.assertIs(backend.dao, dao_b)
+        self.assertEqual(backend._get_mock_paths()[-1:], ["/b"])
+
+        # The cache doesn't keep DAO instances alive
+        dao_a = weakref.ref(dao_a)
+        gc.collect()
+        self.assertIsNone(dao_a())
+
+    def test_implementation_settings_changed(self):
+        self.assertIsInstance(TDAO().get_implementation(), Backend)
+        with override_settings(RESTCLIENTS_BACKEND_TEST_DAO_CLASS="Mock"):
+            self.assertIsInstance(TDAO().get_implementation(), MockDAO)
+            self.assertNotIsInstance(TDAO().get_implementation(), Backend)
+        self.assertIsInstance(TDAO().get_implementation(), Backend)
+
     @override_settings(RESTCLIENTS_BACKEND_TEST_FOO=True,
                        RESTCLIENTS_FOO=False,
                        RESTCLIENTS_BAR=True)
@@ -157,8 +287,43 @@ class TestBackend(TestCase):
         self.assertTrue(cache1 == cache4, 'Cache objects are same instance')
 
 
+class SlowDAO(TDAO):
+    def get_default_service_setting(self, key):
+        if "DAO_CLASS" == key:
+            return ('restclients_core.tests.dao_implementation.'
+                    'test_backend.SlowBackend')
+
+
+class SlowBackend(MockDAO):
+    lock = Lock()
+
+    @classmethod
+    def reset(cls):
+        cls.running = 0
+        cls.max_running = 0
+        cls.threads = set()
+
+    def load(self, method, url, headers, body):
+        with SlowBackend.lock:
+            SlowBackend.running += 1
+            SlowBackend.max_running = max(SlowBackend.max_running,
+                                          SlowBackend.running)
+            SlowBackend.threads.add(current_thread())
+        time.sleep(0.02)
+        with SlowBackend.lock:
+            SlowBackend.running -= 1
+
+        response = MockHTTP()
+        response.status = 200
+        response.data = url
+        return response
+
+
 class Backend(MockDAO):
     def load(self, method, url, headers, body):
+        if url == '/error':
+            raise DataFailureException(url, 500, "error")
+
         response = MockHTTP()
         response.status = 200
         response.data = "ok - {}".format(method)
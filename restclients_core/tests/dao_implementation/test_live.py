@@ -3,12 +3,24 @@
 
 from unittest import TestCase, skipUnless
 from commonconf import override_settings
-from restclients_core.dao import DAO
-from restclients_core.exceptions import DataFailureException
+from restclients_core.dao import DAO, LiveDAO, aiohttp
+from restclients_core.models import CacheHTTP
+from restclients_core.util.budget import RequestBudget
+from restclients_core.exceptions import (
+    DataFailureException, CircuitOpenException, RateLimitException,
+    BulkheadFullException)
+from urllib3 import HTTPResponse
 from urllib3.connectionpool import HTTPConnectionPool
-from urllib3.exceptions import MaxRetryError, SSLError
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError, SSLError
+from prometheus_client import REGISTRY
+from threading import Event, Thread
+import asyncio
+import gc
 import mock
 import os
+import time
+import weakref
 
 
 class TDAO(DAO):
@@ -80,6 +92,515 @@ class SSLBadIgnoreTDAO(DAO):
             return False
 
 
+class SameHostTDAO(TDAO):
+    def service_name(self):
+        return "live_test_same_host"
+
+    def get_default_service_setting(self, key):
+        if "HOST" == key:
+            return "http://LOCALHOST:9876"
+        return super().get_default_service_setting(key)
+
+
+class TestLivePools(TestCase):
+    def setUp(self):
+        LiveDAO.pools = {}
+        LiveDAO.shared_pools = {}
+        LiveDAO.pool_services = {}
+        LiveDAO.pool_sizes = {}
+
+    tearDown = setUp
+
+    def test_not_shared(self):
+        pool = TDAO().get_implementation().get_pool()
+        self.assertIs(TDAO().get_implementation().get_pool(), pool)
+        self.assertIsNot(
+            SameHostTDAO().get_implementation().get_pool(), pool)
+
+        # Both services have to opt in
+        with override_settings(RESTCLIENTS_LIVE_TEST_SAME_HOST_SHARE_POOL=(
+                True)):
+            self.assertIsNot(
+                SameHostTDAO().get_implementation().get_pool(), pool)
+
+    @override_settings(RESTCLIENTS_SHARE_POOL=True)
+    def test_shared_pool(self):
+        pool = TDAO().get_implementation().get_pool()
+        self.assertEqual(pool.pool.maxsize, 10)
+
+        # Sized for both services
+        shared_pool = SameHostTDAO().get_implementation().get_pool()
+        self.assertEqual(shared_pool.pool.maxsize, 20)
+        self.assertIs(TDAO().get_implementation().get_pool(), shared_pool)
+        # The smaller pool was closed
+        self.assertIsNone(pool.pool)
+
+        # Different client certificates
+        self.assertIsNot(SSLTDAO().get_implementation().get_pool(),
+                         SSLClientCertTDAO().get_implementation().get_pool())
+
+        self.assertEqual(len(LiveDAO.shared_pools), 3)
+        self.assertEqual(LiveDAO.pool_sizes, {
+            key: 10 * len(services)
+            for key, services in LiveDAO.pool_services.items()})
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_pool_services", {"service": "live_test"}), 2)
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_pool_services", {"service": "live_ssl_test"}), 1)
+
+    def test_shared_ssl_context(self):
+        kwargs = SSLTDAO().get_implementation()._get_pool_kwargs()[1]
+        self.assertIs(
+            SSLTDAO().get_implementation()._get_pool_kwargs()[1][
+                "ssl_context"], kwargs["ssl_context"])
+        self.assertNotIn("ssl_version", kwargs)
+
+        with override_settings(
+                RESTCLIENTS_CA_BUNDLE="/missing/ca-bundle.crt"):
+            kwargs = SSLTDAO().get_implementation()._get_pool_kwargs()[1]
+            self.assertEqual(kwargs["ca_certs"], "/missing/ca-bundle.crt")
+
+    def test_cached_pool_kwargs(self):
+        live_dao = SSLTDAO().get_implementation()
+        kwargs = live_dao._get_pool_kwargs()
+        with mock.patch("os.path.exists") as mock_exists:
+            self.assertIs(SSLTDAO().get_implementation()._get_pool_kwargs(),
+                          kwargs)
+            live_dao._get_pool_key()
+            self.assertEqual(mock_exists.call_count, 0)
+
+        with override_settings(RESTCLIENTS_LIVE_SSL_TEST_TIMEOUT=1):
+            self.assertEqual(live_dao._get_pool_kwargs()[1][
+                "timeout"].read_timeout, 1)
+
+    @override_settings(RESTCLIENTS_SHARE_POOL=True,
+                       RESTCLIENTS_LIVE_TEST_SAME_HOST_POOL_SIZE=5)
+    def test_shared_pool_sizes(self):
+        TDAO().get_implementation().get_pool()
+        pool = SameHostTDAO().get_implementation().get_pool()
+        self.assertEqual(pool.pool.maxsize, 15)
+
+    @override_settings(RESTCLIENTS_SHARE_POOL=True)
+    def test_replaced_pool(self):
+        live_dao = TDAO().get_implementation()
+        pool = live_dao.get_pool()
+        shared_pool = SameHostTDAO().get_implementation().get_pool()
+
+        # A request that got the smaller pool before it was closed
+        with mock.patch.object(live_dao, "get_pool",
+                               side_effect=[pool, shared_pool]), \
+                mock.patch.object(shared_pool, "urlopen") as mock_urlopen:
+            mock_urlopen.return_value = HTTPResponse(status=200)
+            response = live_dao._urlopen("GET", "/ok", {}, None)
+            self.assertEqual(response.status, 200)
+            self.assertEqual(mock_urlopen.call_count, 1)
+
+    @override_settings(RESTCLIENTS_SHARE_POOL=True)
+    def test_different_settings(self):
+        pool = TDAO().get_implementation().get_pool()
+        with override_settings(RESTCLIENTS_LIVE_TEST_SAME_HOST_TIMEOUT=1):
+            self.assertIsNot(
+                SameHostTDAO().get_implementation().get_pool(), pool)
+
+    def test_concurrent_create(self):
+        create_pool = LiveDAO.create_pool
+
+        def slow_create_pool(live_dao, *args):
+            time.sleep(0.05)
+            return create_pool(live_dao, *args)
+
+        pools = []
+        with mock.patch.object(LiveDAO, "create_pool", autospec=True,
+                               side_effect=slow_create_pool) as mock_create:
+            threads = [Thread(target=lambda: pools.append(
+                TDAO().get_implementation().get_pool())) for i in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(mock_create.call_count, 1)
+            self.assertEqual(len(pools), 5)
+            self.assertEqual(len(set(pools)), 1)
+
+    def test_request_headers(self):
+        live_dao = TDAO().get_implementation()
+        headers = {"Accept": "application/json"}
+        self.assertEqual(live_dao._get_request_headers(headers), {
+            "Accept": "application/json", "Accept-Encoding": ACCEPT_ENCODING})
+        self.assertEqual(headers, {"Accept": "application/json"})
+        self.assertEqual(live_dao._get_request_headers(None), {
+            "Accept-Encoding": ACCEPT_ENCODING})
+
+        headers = {"accept-encoding": "identity"}
+        self.assertIs(live_dao._get_request_headers(headers), headers)
+
+        with override_settings(RESTCLIENTS_LIVE_TEST_ACCEPT_ENCODING="gzip"):
+            self.assertEqual(live_dao._get_request_headers({}), {
+                "Accept-Encoding": "gzip"})
+
+        with override_settings(RESTCLIENTS_LIVE_TEST_ACCEPT_ENCODING=None):
+            self.assertEqual(live_dao._get_request_headers({}), {})
+
+    @override_settings(RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT=True,
+                       RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT_MIN_SAMPLES=5)
+    def test_adaptive_timeout(self):
+        LiveDAO.latencies = {}
+        live_dao = TDAO().get_implementation()
+
+        # Not enough samples yet
+        for i in range(4):
+            live_dao._add_latency(0.5)
+        self.assertEqual(live_dao._get_request_timeout(10), 10)
+
+        live_dao._add_latency(0.5)
+        self.assertEqual(live_dao._get_request_timeout(10), 1.5)
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_effective_timeout_seconds",
+            {"service": "live_test"}), 1.5)
+
+        # Bounded by the max, which defaults to the static timeout
+        live_dao._add_latency(30)
+        self.assertEqual(live_dao._get_request_timeout(10), 10)
+        with override_settings(
+                RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT=True,
+                RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT_MIN_SAMPLES=5,
+                RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT_PERCENTILE=50,
+                RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT_MIN=2):
+            # Response times are collected again for the new settings
+            self.assertEqual(live_dao._get_request_timeout(10), 10)
+            for i in range(5):
+                live_dao._add_latency(0.5)
+            self.assertEqual(live_dao._get_request_timeout(10), 2)
+
+        LiveDAO.latencies = {}
+
+    @override_settings(RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT=True,
+                       RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT_MIN_SAMPLES=5,
+                       RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT_MIN=0.1)
+    def test_adaptive_timeout_grows(self):
+        LiveDAO.latencies = {}
+        live_dao = TDAO().get_implementation()
+        for i in range(5):
+            live_dao._add_latency(0.01)
+        self.assertEqual(live_dao._get_request_timeout(10), 0.1)
+
+        pool = live_dao.get_pool()
+        errors = [ReadTimeoutError(pool, "/ok", "Read timed out."),
+                  MaxRetryError(pool, "/ok", ReadTimeoutError(
+                      pool, "/ok", "Read timed out."))]
+        with mock.patch.object(HTTPConnectionPool, "urlopen",
+                               side_effect=errors):
+            for error in errors:
+                self.assertRaises(DataFailureException,
+                                  TDAO().getURL, "/ok", {})
+
+        # Timed out requests count as at least the timeout: 0.1s, then
+        # 0.3s
+        self.assertEqual(len(live_dao._get_latencies()), 7)
+        self.assertAlmostEqual(live_dao._get_request_timeout(10), 0.9)
+        LiveDAO.latencies = {}
+
+    def test_static_timeout(self):
+        live_dao = TDAO().get_implementation()
+        live_dao._add_latency(0.5)
+        self.assertEqual(LiveDAO.latencies, {})
+        self.assertEqual(live_dao._get_request_timeout(10), 10)
+
+    @mock.patch('restclients_core.dao.random.uniform')
+    def test_retry_delay(self, mock_uniform):
+        mock_uniform.side_effect = lambda a, b: b
+        live_dao = TDAO().get_implementation()
+        self.assertEqual([live_dao._get_retry_delay(attempt)
+                          for attempt in range(6)],
+                         [0.1, 0.2, 0.4, 0.8, 1.6, 2])
+
+    def test_warm_up_failure(self):
+        with override_settings(RESTCLIENTS_LIVE_TEST_HOST="http://localhost:1",
+                               RESTCLIENTS_LIVE_TEST_CONNECT_TIMEOUT=0.5):
+            with self.assertLogs("restclients_core.dao", level="WARNING"):
+                self.assertEqual(TDAO().warm_up(2), 0)
+
+    def test_warm_up_mock(self):
+        with override_settings(RESTCLIENTS_LIVE_TEST_DAO_CLASS="Mock"):
+            self.assertEqual(TDAO().warm_up(), 0)
+        self.assertEqual(LiveDAO.pools, {})
+
+
+@override_settings(RESTCLIENTS_LIVE_TEST_CIRCUIT_BREAKER=True,
+                   RESTCLIENTS_LIVE_TEST_CIRCUIT_BREAKER_FAILURES=2)
+class TestLiveCircuitBreaker(TestCase):
+    def setUp(self):
+        LiveDAO.circuit_breakers = {}
+
+    tearDown = setUp
+
+    def _get_transitions(self, state):
+        return REGISTRY.get_sample_value(
+            "restclient_circuit_transition_total",
+            {"service": "live_test", "state": state}) or 0
+
+    @mock.patch.object(HTTPConnectionPool, 'urlopen')
+    def test_open(self, mock_urlopen):
+        mock_urlopen.side_effect = MaxRetryError(None, '/ok')
+        opened = self._get_transitions("open")
+
+        for i in range(2):
+            self.assertRaises(DataFailureException, TDAO().getURL, '/ok', {})
+        self.assertEqual(self._get_transitions("open") - opened, 1)
+
+        with self.assertRaises(CircuitOpenException) as cm:
+            TDAO().getURL('/ok', {})
+        self.assertEqual(cm.exception.url, '/ok')
+        self.assertEqual(mock_urlopen.call_count, 2)
+
+    def test_dao_not_kept(self):
+        live_dao = TDAO().get_implementation()
+        live_dao._check_circuit_breaker('/ok')
+        ref = weakref.ref(live_dao)
+        del live_dao
+        gc.collect()
+        self.assertIsNone(ref())
+
+    @mock.patch.object(HTTPConnectionPool, 'urlopen')
+    def test_server_errors(self, mock_urlopen):
+        mock_urlopen.return_value = HTTPResponse(body=b'error', status=503)
+        for i in range(2):
+            self.assertEqual(TDAO().getURL('/ok', {}).status, 503)
+        self.assertRaises(CircuitOpenException, TDAO().getURL, '/ok', {})
+
+    @mock.patch.object(HTTPConnectionPool, 'urlopen')
+    def test_not_enabled(self, mock_urlopen):
+        mock_urlopen.side_effect = MaxRetryError(None, '/ok')
+        with override_settings(RESTCLIENTS_LIVE_TEST_CIRCUIT_BREAKER=False):
+            for i in range(3):
+                self.assertRaises(
+                    DataFailureException, TDAO().getURL, '/ok', {})
+        self.assertEqual(mock_urlopen.call_count, 3)
+
+
+@override_settings(RESTCLIENTS_LIVE_TEST_RETRIES=2)
+@mock.patch.object(LiveDAO, '_get_retry_delay', return_value=0)
+@mock.patch.object(HTTPConnectionPool, 'urlopen')
+class TestLiveRetries(TestCase):
+    def setUp(self):
+        LiveDAO.retry_budgets = {}
+
+    tearDown = setUp
+
+    def test_retry(self, mock_urlopen, mock_delay):
+        mock_urlopen.side_effect = [
+            MaxRetryError(None, '/ok'),
+            HTTPResponse(body=b'error', status=503),
+            HTTPResponse(body=b'ok', status=200)]
+
+        response = TDAO().getURL('/ok', {})
+        self.assertEqual(response.data, b'ok')
+        self.assertEqual(mock_urlopen.call_count, 3)
+        mock_delay.assert_has_calls([mock.call(0), mock.call(1)])
+
+    def test_retries_used(self, mock_urlopen, mock_delay):
+        mock_urlopen.side_effect = MaxRetryError(None, '/ok')
+        self.assertRaises(DataFailureException, TDAO().getURL, '/ok', {})
+        self.assertEqual(mock_urlopen.call_count, 3)
+
+        mock_urlopen.reset_mock()
+        mock_urlopen.side_effect = None
+        mock_urlopen.return_value = HTTPResponse(body=b'error', status=503)
+        self.assertEqual(TDAO().getURL('/ok', {}).status, 503)
+        self.assertEqual(mock_urlopen.call_count, 3)
+
+    def test_not_idempotent(self, mock_urlopen, mock_delay):
+        mock_urlopen.side_effect = MaxRetryError(None, '/ok')
+        self.assertRaises(DataFailureException, TDAO().postURL, '/ok', {})
+        self.assertEqual(mock_urlopen.call_count, 1)
+
+    def test_not_enabled(self, mock_urlopen, mock_delay):
+        mock_urlopen.side_effect = MaxRetryError(None, '/ok')
+        with override_settings(RESTCLIENTS_LIVE_TEST_RETRIES=0):
+            self.assertRaises(DataFailureException, TDAO().getURL, '/ok', {})
+        self.assertEqual(mock_urlopen.call_count, 1)
+
+    def test_budget(self, mock_urlopen, mock_delay):
+        mock_urlopen.side_effect = MaxRetryError(None, '/ok')
+        exhausted = REGISTRY.get_sample_value(
+            "restclient_request_retry_budget_exhausted_total",
+            {"service": "live_test"}) or 0
+
+        with mock.patch.object(LiveDAO, '_create_retry_budget',
+                               return_value=RequestBudget(0.5, max_tokens=1)):
+            self.assertRaises(DataFailureException, TDAO().getURL, '/ok', {})
+        self.assertEqual(mock_urlopen.call_count, 2)
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_request_retry_budget_exhausted_total",
+            {"service": "live_test"}), exhausted + 1)
+
+
+@override_settings(RESTCLIENTS_LIVE_TEST_RATE_LIMIT=10,
+                   RESTCLIENTS_LIVE_TEST_RATE_LIMIT_BURST=2)
+@mock.patch.object(HTTPConnectionPool, 'urlopen')
+class TestLiveRateLimit(TestCase):
+    def setUp(self):
+        LiveDAO.rate_limiters = {}
+
+    tearDown = setUp
+
+    def test_blocking(self, mock_urlopen):
+        mock_urlopen.side_effect = lambda *args, **kwargs: HTTPResponse(
+            body=b'ok', status=200)
+
+        start_time = time.monotonic()
+        for i in range(4):
+            self.assertEqual(TDAO().getURL('/ok', {}).status, 200)
+        self.assertGreater(time.monotonic() - start_time, 0.15)
+
+    def test_fail_fast(self, mock_urlopen):
+        mock_urlopen.return_value = HTTPResponse(body=b'ok', status=200)
+        limited = REGISTRY.get_sample_value(
+            "restclient_request_rate_limited_total",
+            {"service": "live_test"}) or 0
+
+        with override_settings(RESTCLIENTS_LIVE_TEST_RATE_LIMIT=10,
+                               RESTCLIENTS_LIVE_TEST_RATE_LIMIT_BURST=2,
+                               RESTCLIENTS_LIVE_TEST_RATE_LIMIT_BLOCK=False):
+            TDAO().getURL('/ok', {})
+            TDAO().getURL('/ok', {})
+            with self.assertRaises(RateLimitException) as cm:
+                TDAO().getURL('/ok', {})
+
+        self.assertEqual(cm.exception.url, '/ok')
+        self.assertEqual(mock_urlopen.call_count, 2)
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_request_rate_limited_total",
+            {"service": "live_test"}), limited + 1)
+
+    def test_timeout(self, mock_urlopen):
+        mock_urlopen.return_value = HTTPResponse(body=b'ok', status=200)
+        with override_settings(RESTCLIENTS_LIVE_TEST_RATE_LIMIT=1,
+                               RESTCLIENTS_LIVE_TEST_RATE_LIMIT_TIMEOUT=0.5):
+            TDAO().getURL('/ok', {})
+            self.assertRaises(
+                RateLimitException, TDAO().getURL, '/ok', {})
+
+    def test_settings_changed(self, mock_urlopen):
+        mock_urlopen.return_value = HTTPResponse(body=b'ok', status=200)
+        with override_settings(RESTCLIENTS_LIVE_TEST_RATE_LIMIT=10,
+                               RESTCLIENTS_LIVE_TEST_RATE_LIMIT_BURST=1,
+                               RESTCLIENTS_LIVE_TEST_RATE_LIMIT_BLOCK=False):
+            TDAO().getURL('/ok', {})
+            self.assertRaises(RateLimitException, TDAO().getURL, '/ok', {})
+
+        with override_settings(RESTCLIENTS_LIVE_TEST_RATE_LIMIT=10,
+                               RESTCLIENTS_LIVE_TEST_RATE_LIMIT_BURST=3,
+                               RESTCLIENTS_LIVE_TEST_RATE_LIMIT_BLOCK=False):
+            for i in range(3):
+                TDAO().getURL('/ok', {})
+            self.assertRaises(RateLimitException, TDAO().getURL, '/ok', {})
+        self.assertEqual(mock_urlopen.call_count, 4)
+
+    def test_circuit_open(self, mock_urlopen):
+        LiveDAO.circuit_breakers = {}
+        mock_urlopen.side_effect = lambda *args, **kwargs: HTTPResponse(
+            body=b'error', status=503)
+        with override_settings(
+                RESTCLIENTS_LIVE_TEST_RATE_LIMIT=1,
+                RESTCLIENTS_LIVE_TEST_RATE_LIMIT_BURST=2,
+                RESTCLIENTS_LIVE_TEST_CIRCUIT_BREAKER=True,
+                RESTCLIENTS_LIVE_TEST_CIRCUIT_BREAKER_FAILURES=1):
+            self.assertEqual(TDAO().getURL('/ok', {}).status, 503)
+
+            # Refused without waiting for, or using up, a token
+            start_time = time.monotonic()
+            for i in range(3):
+                self.assertRaises(
+                    CircuitOpenException, TDAO().getURL, '/ok', {})
+            self.assertLess(time.monotonic() - start_time, 0.5)
+            rate_limiter = TDAO().get_implementation()._get_rate_limiter()
+            self.assertIsNotNone(rate_limiter.reserve(0))
+        LiveDAO.circuit_breakers = {}
+
+
+@override_settings(RESTCLIENTS_LIVE_TEST_BULKHEAD_MAX_CONCURRENT=1,
+                   RESTCLIENTS_LIVE_TEST_BULKHEAD_MAX_QUEUED=1,
+                   RESTCLIENTS_LIVE_TEST_BULKHEAD_TIMEOUT=5)
+@mock.patch.object(HTTPConnectionPool, 'urlopen')
+class TestLiveBulkhead(TestCase):
+    def setUp(self):
+        LiveDAO.bulkheads = {}
+
+    tearDown = setUp
+
+    def _get_gauge(self, name):
+        return REGISTRY.get_sample_value(
+            "restclient_bulkhead_{}".format(name), {"service": "live_test"})
+
+    def test_shed(self, mock_urlopen):
+        release = Event()
+
+        def slow_urlopen(*args, **kwargs):
+            release.wait(5)
+            return HTTPResponse(body=b'ok', status=200)
+
+        mock_urlopen.side_effect = slow_urlopen
+        responses = []
+        threads = [Thread(target=lambda: responses.append(
+            TDAO().getURL('/ok', {}))) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+
+        self.assertEqual(self._get_gauge("in_flight"), 1)
+        self.assertEqual(self._get_gauge("queued"), 1)
+
+        shed = REGISTRY.get_sample_value(
+            "restclient_request_shed_total", {"service": "live_test"}) or 0
+        self.assertRaises(BulkheadFullException, TDAO().getURL, '/ok', {})
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_request_shed_total", {"service": "live_test"}),
+            shed + 1)
+
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(mock_urlopen.call_count, 2)
+        self.assertEqual(self._get_gauge("in_flight"), 0)
+        self.assertEqual(self._get_gauge("queued"), 0)
+
+    def test_stream(self, mock_urlopen):
+        mock_urlopen.return_value = HTTPResponse(body=b'ok', status=200)
+        response = TDAO().getURL('/ok', {}, stream=True)
+        self.assertEqual(self._get_gauge("in_flight"), 1)
+
+        response.release_conn()
+        self.assertEqual(self._get_gauge("in_flight"), 0)
+
+    def test_rate_limited(self, mock_urlopen):
+        mock_urlopen.return_value = HTTPResponse(body=b'ok', status=200)
+        with override_settings(
+                RESTCLIENTS_LIVE_TEST_BULKHEAD_MAX_CONCURRENT=1,
+                RESTCLIENTS_LIVE_TEST_RATE_LIMIT=2,
+                RESTCLIENTS_LIVE_TEST_RATE_LIMIT_BURST=1):
+            LiveDAO.rate_limiters = {}
+            TDAO().getURL('/ok', {})
+
+            # Waiting for a token doesn't take a turn
+            thread = Thread(target=TDAO().getURL, args=('/ok', {}))
+            thread.start()
+            time.sleep(0.1)
+            self.assertEqual(self._get_gauge("in_flight"), 0)
+            thread.join()
+        self.assertEqual(mock_urlopen.call_count, 2)
+        LiveDAO.rate_limiters = {}
+
+    def test_not_enabled(self, mock_urlopen):
+        mock_urlopen.return_value = HTTPResponse(body=b'ok', status=200)
+        with override_settings():
+            TDAO().getURL('/ok', {})
+        self.assertEqual(LiveDAO.bulkheads, {})
+
+
 @skipUnless("RUN_LIVE_TESTS" in os.environ, "RUN_LIVE_TESTS=1 to run tests")
 class TestLive(TestCase):
     def test_found_resource(self):
@@ -93,6 +614,108 @@ class TestLive(TestCase):
     def test_clear_cached_response(self):
         self.assertIsNone(TDAO().clear_cached_response('/ok'))
 
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+        'restclients_core.cache.MemoryCache'))
+    def test_revalidate(self):
+        DAO._cache_instance = None
+        response = TDAO().getURL('/etag', {})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, b'etag')
+
+        # Expire the entry, so it is revalidated
+        DAO._cache_instance._entries[('live_test', '/etag')].expires = 0
+        response = TDAO().getURL('/etag', {})
+        self.assertIsInstance(response, CacheHTTP)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, b'etag')
+        DAO._cache_instance = None
+
+    def test_warm_up(self):
+        LiveDAO.pools = {}
+        LiveDAO.shared_pools = {}
+        self.assertEqual(TDAO().warm_up(2), 2)
+        pool = TDAO().get_implementation().get_pool()
+        self.assertEqual(pool.num_connections, 2)
+
+        # Already open
+        self.assertEqual(TDAO().warm_up(1), 0)
+
+        with override_settings(RESTCLIENTS_LIVE_TEST_POOL_WARM_CONNECTIONS=5):
+            self.assertEqual(TDAO().warm_up(), 3)
+
+        response = TDAO().getURL('/ok', {})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(pool.num_connections, 5)
+
+    def test_stream(self):
+        LiveDAO.pools = {}
+        LiveDAO.shared_pools = {}
+        response = TDAO().getURL('/large', {}, stream=True)
+        self.assertEqual(response.status, 200)
+
+        pool = TDAO().get_implementation().get_pool()
+        self.assertIsNotNone(response.connection)
+        self.assertEqual(pool.pool.qsize(), 9)
+
+        chunks = list(response.stream(2**16))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks), b"x" * 2**20)
+
+        # The connection is back in the pool
+        self.assertIsNone(response.connection)
+        self.assertEqual(pool.pool.qsize(), 10)
+
+    def test_stream_in_flight(self):
+        LiveDAO.pools = {}
+        LiveDAO.shared_pools = {}
+        response = TDAO().getURL('/large', {}, stream=True)
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_pool_in_flight", {"service": "live_test"}), 1)
+
+        response.read()
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_pool_in_flight", {"service": "live_test"}), 0)
+
+        # Closed without reading the body
+        response = TDAO().getURL('/large', {}, stream=True)
+        response.close()
+        response.close()
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_pool_in_flight", {"service": "live_test"}), 0)
+
+    def test_content_encoding(self):
+        def get_bytes():
+            return [REGISTRY.get_sample_value(
+                "restclient_response_{}_bytes_total".format(name),
+                {"service": "live_test"}) or 0 for name in ("wire", "decoded")]
+
+        wire_before, decoded_before = get_bytes()
+        response = TDAO().getURL('/gzip', {})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.data, b"compressible " * 1000)
+
+        wire_after, decoded_after = get_bytes()
+        self.assertEqual(decoded_after - decoded_before, 13000)
+        self.assertLess(wire_after - wire_before, 1000)
+
+        with override_settings(RESTCLIENTS_LIVE_TEST_ACCEPT_ENCODING=False):
+            response = TDAO().getURL('/gzip', {})
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.data, b"compressible " * 1000)
+
+    @override_settings(RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT=True,
+                       RESTCLIENTS_LIVE_TEST_ADAPTIVE_TIMEOUT_MIN_SAMPLES=2)
+    def test_adaptive_timeout(self):
+        LiveDAO.latencies = {}
+        for i in range(3):
+            response = TDAO().getURL('/ok', {})
+            self.assertEqual(response.status, 200)
+        self.assertEqual(len(TDAO().get_implementation()._get_latencies()), 3)
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_effective_timeout_seconds",
+            {"service": "live_test"}), 1)
+        LiveDAO.latencies = {}
+
     def test_missing_resource(self):
         response = TDAO().getURL('/missing.json', {})
         self.assertEqual(response.status, 404)
@@ -155,6 +778,96 @@ class TestLive(TestCase):
             self.assertEqual(live_dao._get_max_pool_size(), 25)
 
 
+@skipUnless("RUN_LIVE_TESTS" in os.environ, "RUN_LIVE_TESTS=1 to run tests")
+@skipUnless(aiohttp is not None, "aiohttp is needed for async requests")
+class TestLiveAsync(TestCase):
+    def _run(self, coroutine):
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await LiveDAO.close_async_sessions()
+        return asyncio.run(main())
+
+    def test_found_resource(self):
+        response = self._run(TDAO().agetURL('/ok', {}))
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, b'ok')
+        self.assertEqual(response.headers["X-Custom-Header"], "header-test")
+
+    def test_content_encoding(self):
+        response = self._run(TDAO().agetURL('/gzip', {}))
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.data, b"compressible " * 1000)
+
+    def test_missing_resource(self):
+        response = self._run(TDAO().agetURL('/missing.json', {}))
+        self.assertEqual(response.status, 404)
+
+    def test_one_redirect(self):
+        response = self._run(TDAO().agetURL('/301', {}))
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, b'ok')
+
+    def test_multiple_redirects(self):
+        with self.assertRaises(DataFailureException) as cm:
+            self._run(TDAO().agetURL('/redirect', {}))
+        self.assertEqual(cm.exception.url, '/redirect')
+        self.assertEqual(cm.exception.status, 0)
+
+    def test_connection_error(self):
+        with override_settings(
+                RESTCLIENTS_LIVE_TEST_HOST="http://localhost:1"):
+            with self.assertRaises(DataFailureException) as cm:
+                self._run(TDAO().agetURL('/ok', {}))
+        self.assertEqual(cm.exception.status, 0)
+
+    def test_concurrent(self):
+        async def main():
+            return await asyncio.gather(
+                *[TDAO().agetURL('/ok', {}) for i in range(20)])
+
+        for response in self._run(main()):
+            self.assertEqual(response.data, b'ok')
+
+    def test_session(self):
+        async def main():
+            session = TDAO().get_implementation().get_async_session()
+            self.assertIs(
+                TDAO().get_implementation().get_async_session(), session)
+            self.assertIsNot(
+                SameHostTDAO().get_implementation().get_async_session(),
+                session)
+
+        self._run(main())
+
+    def test_closed_loops(self):
+        async def main():
+            TDAO().get_implementation().get_async_session()
+
+        # Without close_async_sessions()
+        with mock.patch.object(aiohttp.ClientSession, "__del__"):
+            asyncio.run(main())
+            asyncio.run(main())
+            self.assertEqual(len(LiveDAO.async_sessions), 1)
+
+            self._run(main())
+            self.assertEqual(LiveDAO.async_sessions, {})
+
+    @override_settings(RESTCLIENTS_SHARE_POOL=True)
+    def test_shared_session(self):
+        async def main():
+            TDAO().get_implementation().get_async_session()
+            session = SameHostTDAO().get_implementation().get_async_session()
+            self.assertIs(
+                TDAO().get_implementation().get_async_session(), session)
+            self.assertEqual(session.connector.limit, 20)
+
+        LiveDAO.pool_services = {}
+        LiveDAO.pool_sizes = {}
+        self._run(main())
+
+
 @skipUnless("RUN_SSL_TESTS" in os.environ, "RUN_SSL_TESTS=1 to run tests")
 class TestLiveSSL(TestCase):
     def test_ssl_found_resource(self):
@@ -165,6 +878,18 @@ class TestLiveSSL(TestCase):
         self.assertEqual(response.headers.get("X-Custom-Header"),
                          "header-test")
 
+    @skipUnless(aiohttp is not None, "aiohttp is needed for async requests")
+    def test_ssl_async(self):
+        async def main():
+            try:
+                return await SSLClientCertTDAO().agetURL('/ok', {})
+            finally:
+                await LiveDAO.close_async_sessions()
+
+        response = asyncio.run(main())
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, b'ok: my.app')
+
     def test_ssl_client_cert(self):
         response = SSLClientCertTDAO().getURL('/ok', {})
         self.assertEqual(response.status, 200)
@@ -0,0 +1,870 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from commonconf import override_settings
+from restclients_core.dao import DAO, MockDAO
+from restclients_core.cache import (
+    MemoryCache, TwoTierCache, DiskCache, NoCache)
+from restclients_core.exceptions import ImproperlyConfigured
+from restclients_core.util.compression import CompressedCacheHTTP
+from restclients_core.models import MockHTTP, CacheHTTP, MappedCacheHTTP
+from restclients_core.tests.dao_implementation.test_backend import TDAO
+import asyncio
+import mock
+import os
+import tempfile
+import time
+
+
+class ETagDAO(TDAO):
+    def get_default_service_setting(self, key):
+        if "DAO_CLASS" == key:
+            return ("restclients_core.tests.test_cache.ETagBackend")
+
+
+class ETagBackend(MockDAO):
+    requests = []
+
+    def load(self, method, url, headers, body):
+        ETagBackend.requests.append(dict(headers))
+        response = MockHTTP()
+        if headers.get("If-None-Match") == '"v1"':
+            response.status = 304
+            response.headers = {"ETag": '"v1"', "X-Refreshed": "yes"}
+            response.data = ""
+        else:
+            response.status = 200
+            response.headers = {"ETag": '"v1"', "Content-Length": "4"}
+            response.data = "body"
+        return response
+
+
+class CountDAO(TDAO):
+    def get_default_service_setting(self, key):
+        if "DAO_CLASS" == key:
+            return ("restclients_core.tests.test_cache.CountBackend")
+
+
+class CountBackend(MockDAO):
+    count = 0
+
+    def load(self, method, url, headers, body):
+        CountBackend.count += 1
+        response = MockHTTP()
+        response.status = 200
+        if url.startswith("/missing"):
+            response.status = 404
+        elif url.startswith("/gone"):
+            response.status = 410
+        response.data = "count {}".format(CountBackend.count)
+        return response
+
+
+class HeadersDAO(TDAO):
+    def get_default_service_setting(self, key):
+        if "DAO_CLASS" == key:
+            return ("restclients_core.tests.test_cache.HeadersBackend")
+
+
+class HeadersBackend(CountBackend):
+    headers = {
+        "/max-age": {"Cache-Control": "max-age=600"},
+        "/no-store": {"Cache-Control": "no-store"},
+    }
+
+    def load(self, method, url, headers, body):
+        response = super().load(method, url, headers, body)
+        response.headers = HeadersBackend.headers.get(url, {})
+        return response
+
+
+class SharedCache(MemoryCache):
+    lookups = 0
+
+    def getCache(self, service, url, headers):
+        SharedCache.lookups += 1
+        return super().getCache(service, url, headers)
+
+
+class LegacyCache(MemoryCache):
+    def processResponse(self, service, url, response):
+        return super().processResponse(service, url, response)
+
+
+def make_response(data="ok", status=200, headers={}):
+    response = MockHTTP()
+    response.status = status
+    response.data = data
+    response.headers = headers
+    return response
+
+
+class TestMemoryCache(TestCase):
+    def test_get_miss(self):
+        cache = MemoryCache()
+        self.assertIsNone(cache.getCache("svc", "/ok", {}))
+
+    def test_store_and_get(self):
+        cache = MemoryCache()
+        cache.processResponse("svc", "/ok", make_response(
+            headers={"Content-Type": "application/json"}))
+
+        response = cache.getCache("svc", "/ok", {})["response"]
+        self.assertIsInstance(response, CacheHTTP)
+        self.assertEqual(response.get_cache_class(), MemoryCache)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, "ok")
+        self.assertEqual(response.getheader("content-type"),
+                         "application/json")
+
+        self.assertIsNone(cache.getCache("svc2", "/ok", {}))
+
+    def test_not_ok_status(self):
+        cache = MemoryCache()
+        cache.processResponse("svc", "/err", make_response(status=500))
+        self.assertIsNone(cache.getCache("svc", "/err", {}))
+
+    def test_delete(self):
+        cache = MemoryCache()
+        cache.processResponse("svc", "/ok", make_response())
+        cache.deleteCache("svc", "/ok")
+        self.assertIsNone(cache.getCache("svc", "/ok", {}))
+        self.assertEqual(cache._size, 0)
+
+    @mock.patch("restclients_core.cache.time")
+    def test_expiration(self, mock_time):
+        mock_time.time.return_value = 1000
+        cache = MemoryCache()
+        cache.processResponse("svc", "/ok", make_response())
+
+        mock_time.time.return_value = 1059
+        self.assertIsNotNone(cache.getCache("svc", "/ok", {}))
+
+        mock_time.time.return_value = 1060
+        self.assertIsNone(cache.getCache("svc", "/ok", {}))
+
+    @override_settings(RESTCLIENTS_SVC_CACHE_TTL=0)
+    def test_service_ttl(self):
+        cache = MemoryCache()
+        cache.processResponse("svc", "/ok", make_response())
+        self.assertIsNone(cache.getCache("svc", "/ok", {}))
+
+        cache.processResponse("other", "/ok", make_response())
+        self.assertIsNotNone(cache.getCache("other", "/ok", {}))
+
+    @override_settings(RESTCLIENTS_MEMORY_CACHE_MAX_ENTRIES=2)
+    def test_evict_entries(self):
+        cache = MemoryCache()
+        cache.processResponse("svc", "/1", make_response())
+        cache.processResponse("svc", "/2", make_response())
+
+        # Touch /1 so /2 is the least recently used
+        cache.getCache("svc", "/1", {})
+        cache.processResponse("svc", "/3", make_response())
+
+        self.assertIsNotNone(cache.getCache("svc", "/1", {}))
+        self.assertIsNone(cache.getCache("svc", "/2", {}))
+        self.assertIsNotNone(cache.getCache("svc", "/3", {}))
+
+    @override_settings(RESTCLIENTS_MEMORY_CACHE_MAX_BYTES=10)
+    def test_evict_bytes(self):
+        cache = MemoryCache()
+        cache.processResponse("svc", "/1", make_response(b"12345"))
+        cache.processResponse("svc", "/2", make_response(b"12345"))
+        self.assertEqual(cache._size, 10)
+
+        cache.processResponse("svc", "/3", make_response(b"123"))
+        self.assertIsNone(cache.getCache("svc", "/1", {}))
+        self.assertIsNotNone(cache.getCache("svc", "/2", {}))
+        self.assertEqual(cache._size, 8)
+
+        # Too large to ever fit
+        cache.processResponse("svc", "/4", make_response(b"12345678901"))
+        self.assertIsNone(cache.getCache("svc", "/4", {}))
+        self.assertEqual(cache._size, 8)
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+        "restclients_core.cache.MemoryCache"))
+    def test_dao(self):
+        DAO._cache_instance = None
+        response = TDAO().getURL("/ok")
+        self.assertNotIsInstance(response, CacheHTTP)
+
+        response = TDAO().getURL("/ok")
+        self.assertIsInstance(response, CacheHTTP)
+        self.assertEqual(response.data, "ok - GET")
+
+        TDAO().clear_cached_response("/ok")
+        response = TDAO().getURL("/ok")
+        self.assertNotIsInstance(response, CacheHTTP)
+        DAO._cache_instance = None
+
+    @mock.patch("restclients_core.cache.time")
+    def test_revalidate(self, mock_time):
+        mock_time.time.return_value = 1000
+        cache = MemoryCache()
+        cache.processResponse("svc", "/ok", make_response(
+            headers={"ETag": '"abc"',
+                     "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+                     "Content-Length": "2"}))
+
+        mock_time.time.return_value = 1060
+        value = cache.getCache("svc", "/ok", {"Accept": "text/plain"})
+        self.assertEqual(value, {"headers": {
+            "Accept": "text/plain",
+            "If-None-Match": '"abc"',
+            "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT"}})
+
+        value = cache.processResponse("svc", "/ok", make_response(
+            "", status=304, headers={"etag": '"abc"', "Content-Length": "0"}))
+        response = value["response"]
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, "ok")
+        self.assertEqual(response.headers, {
+            "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+            "Content-Length": "2", "etag": '"abc"'})
+
+        # Lifetime restarted
+        mock_time.time.return_value = 1119
+        self.assertIn("response", cache.getCache("svc", "/ok", {}))
+
+    @override_settings(RESTCLIENTS_CACHE_CONTROL=True)
+    @mock.patch("restclients_core.cache.time")
+    def test_revalidate_cache_control(self, mock_time):
+        mock_time.time.return_value = 1000
+        cache = MemoryCache()
+        cache.processResponse("svc", "/ok", make_response(
+            headers={"ETag": '"abc"', "Cache-Control": "max-age=600"}),
+            ttl=600)
+
+        # The stored max-age still applies
+        mock_time.time.return_value = 1600
+        cache.processResponse("svc", "/ok", make_response(
+            "", status=304, headers={"ETag": '"abc"'}))
+        self.assertEqual(cache._entries[("svc", "/ok")].expires, 2200)
+
+        # Updated by the 304
+        cache.processResponse("svc", "/ok", make_response(
+            "", status=304, headers={"Cache-Control": "max-age=120"}))
+        self.assertEqual(cache._entries[("svc", "/ok")].expires, 1720)
+
+        with override_settings(RESTCLIENTS_CACHE_CONTROL=True,
+                               RESTCLIENTS_CACHE_CONTROL_MAX_TTL=60):
+            cache.processResponse("svc", "/ok", make_response(
+                "", status=304))
+        self.assertEqual(cache._entries[("svc", "/ok")].expires, 1660)
+
+    def test_not_modified_without_entry(self):
+        cache = MemoryCache()
+        self.assertIsNone(cache.processResponse(
+            "svc", "/ok", make_response("", status=304)))
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+        "restclients_core.cache.MemoryCache"))
+    @mock.patch("restclients_core.cache.time")
+    def test_dao_revalidate(self, mock_time):
+        DAO._cache_instance = None
+        ETagBackend.requests = []
+        mock_time.time.return_value = 1000
+
+        response = ETagDAO().getURL("/etag", {})
+        self.assertEqual(response.data, "body")
+
+        mock_time.time.return_value = 1060
+        response = ETagDAO().getURL("/etag", {})
+        self.assertIsInstance(response, CacheHTTP)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, "body")
+        self.assertEqual(response.getheader("X-Refreshed"), "yes")
+        self.assertEqual(ETagBackend.requests,
+                         [{}, {"If-None-Match": '"v1"'}])
+
+        # The cache lost the entry, so the request is made again without
+        # the conditional headers
+        with mock.patch.object(MemoryCache, "_revalidate") as revalidate:
+            revalidate.return_value = None
+            mock_time.time.return_value = 1200
+            response = ETagDAO().getURL("/etag", {})
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.data, "body")
+            self.assertEqual(ETagBackend.requests[2:],
+                             [{"If-None-Match": '"v1"'}, {}])
+        DAO._cache_instance = None
+
+    @override_settings(RESTCLIENTS_SVC_CACHE_STALE_WINDOW=30)
+    @mock.patch("restclients_core.cache.time")
+    def test_stale_window(self, mock_time):
+        mock_time.time.return_value = 1000
+        cache = MemoryCache()
+        cache.processResponse("svc", "/ok", make_response(
+            headers={"ETag": '"abc"'}))
+
+        mock_time.time.return_value = 1061
+        value = cache.getCache("svc", "/ok", {})
+        self.assertEqual(value["response"].data, "ok")
+        self.assertTrue(value["stale"])
+        self.assertEqual(value["headers"], {"If-None-Match": '"abc"'})
+
+        # Only the first caller refreshes
+        value = cache.getCache("svc", "/ok", {})
+        self.assertEqual(value["response"].data, "ok")
+        self.assertNotIn("headers", value)
+
+        cache.processResponse("svc", "/ok", make_response("", status=304))
+        value = cache.getCache("svc", "/ok", {})
+        self.assertNotIn("stale", value)
+
+        # Past the stale window, revalidate before responding
+        mock_time.time.return_value = 1160
+        value = cache.getCache("svc", "/ok", {})
+        self.assertEqual(value, {"headers": {"If-None-Match": '"abc"'}})
+
+    @override_settings(RESTCLIENTS_SVC_CACHE_STALE_WINDOW=100,
+                       RESTCLIENTS_SVC_CACHE_REFRESH_TIMEOUT=10)
+    @mock.patch("restclients_core.cache.time")
+    def test_failed_refresh(self, mock_time):
+        mock_time.time.return_value = 1000
+        cache = MemoryCache()
+        cache.processResponse("svc", "/ok", make_response(
+            headers={"ETag": '"abc"'}))
+
+        mock_time.time.return_value = 1061
+        self.assertIn("headers", cache.getCache("svc", "/ok", {}))
+        self.assertNotIn("headers", cache.getCache("svc", "/ok", {}))
+
+        # The refresh failed, so a later caller tries again
+        mock_time.time.return_value = 1071
+        value = cache.getCache("svc", "/ok", {})
+        self.assertEqual(value["headers"], {"If-None-Match": '"abc"'})
+        self.assertTrue(value["stale"])
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           "restclients_core.cache.MemoryCache"),
+                       RESTCLIENTS_CACHE_STALE_WINDOW=30)
+    @mock.patch("restclients_core.cache.time")
+    def test_dao_stale(self, mock_time):
+        DAO._cache_instance = None
+        CountBackend.count = 0
+        mock_time.time.return_value = 1000
+
+        response = CountDAO().getURL("/count", {})
+        self.assertEqual(response.data, "count 1")
+
+        # The stale response is returned, and refreshed
+        mock_time.time.return_value = 1070
+        response = CountDAO().getURL("/count", {})
+        self.assertEqual(response.data, "count 1")
+        self.assertEqual(CountBackend.count, 2)
+
+        response = CountDAO().getURL("/count", {})
+        self.assertEqual(response.data, "count 2")
+        self.assertEqual(CountBackend.count, 2)
+        DAO._cache_instance = None
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           "restclients_core.cache.MemoryCache"),
+                       RESTCLIENTS_CACHE_STALE_WINDOW=30)
+    @mock.patch("restclients_core.cache.time")
+    def test_dao_stale_async(self, mock_time):
+        DAO._cache_instance = None
+        CountBackend.count = 0
+        mock_time.time.return_value = 1000
+
+        async def main():
+            response = await CountDAO().agetURL("/count", {})
+            self.assertEqual(response.data, "count 1")
+
+            # The stale response is returned, and refreshed in a task
+            mock_time.time.return_value = 1070
+            response = await CountDAO().agetURL("/count", {})
+            self.assertEqual(response.data, "count 1")
+            self.assertEqual(CountBackend.count, 1)
+
+            await asyncio.gather(*DAO._refresh_tasks)
+            self.assertEqual(CountBackend.count, 2)
+
+            response = await CountDAO().agetURL("/count", {})
+            self.assertEqual(response.data, "count 2")
+
+        asyncio.run(main())
+        DAO._cache_instance = None
+
+    @mock.patch("restclients_core.cache.time")
+    def test_explicit_ttl(self, mock_time):
+        mock_time.time.return_value = 1000
+        cache = MemoryCache()
+        cache.processResponse("svc", "/missing", make_response(status=404),
+                              ttl=10)
+        cache.processResponse("svc", "/ok", make_response(), ttl=0)
+        self.assertIsNone(cache.getCache("svc", "/ok", {}))
+
+        response = cache.getCache("svc", "/missing", {})["response"]
+        self.assertEqual(response.status, 404)
+
+        mock_time.time.return_value = 1010
+        self.assertIsNone(cache.getCache("svc", "/missing", {}))
+
+    @override_settings(RESTCLIENTS_SVC_CACHE_COMPRESS_MIN_SIZE=100)
+    def test_compression(self):
+        body = "compressible " * 100
+        cache = MemoryCache()
+        cache.processResponse("svc", "/large", make_response(body))
+        cache.processResponse("svc", "/small", make_response("small"))
+        cache.processResponse("other", "/large", make_response(body))
+
+        entry = cache._entries[("svc", "/large")]
+        self.assertTrue(entry.compressed)
+        self.assertLess(entry.size, 100)
+        self.assertEqual(cache._size, entry.size + 5 + len(body))
+
+        response = cache.getCache("svc", "/large", {})["response"]
+        self.assertIsInstance(response, CompressedCacheHTTP)
+        self.assertEqual(response.get_cache_class(), MemoryCache)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, body)
+
+        response = cache.getCache("svc", "/small", {})["response"]
+        self.assertNotIsInstance(response, CompressedCacheHTTP)
+        self.assertEqual(response.data, "small")
+
+        response = cache.getCache("other", "/large", {})["response"]
+        self.assertNotIsInstance(response, CompressedCacheHTTP)
+        self.assertEqual(response.data, body)
+
+
+@override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+    "restclients_core.cache.MemoryCache"))
+class TestNegativeCache(TestCase):
+    def setUp(self):
+        DAO._cache_instance = None
+        CountBackend.count = 0
+
+    def tearDown(self):
+        DAO._cache_instance = None
+
+    def test_disabled(self):
+        CountDAO().getURL("/missing", {})
+        response = CountDAO().getURL("/missing", {})
+        self.assertEqual(response.status, 404)
+        self.assertEqual(CountBackend.count, 2)
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           "restclients_core.cache.MemoryCache"),
+                       RESTCLIENTS_BACKEND_TEST_NEGATIVE_CACHE_TTL=10)
+    @mock.patch("restclients_core.cache.time")
+    def test_not_found(self, mock_time):
+        mock_time.time.return_value = 1000
+        CountDAO().getURL("/missing", {})
+        response = CountDAO().getURL("/missing", {})
+        self.assertIsInstance(response, CacheHTTP)
+        self.assertEqual(response.status, 404)
+        self.assertEqual(CountBackend.count, 1)
+
+        mock_time.time.return_value = 1010
+        response = CountDAO().getURL("/missing", {})
+        self.assertEqual(CountBackend.count, 2)
+
+        # Not configured as a cacheable error
+        CountDAO().getURL("/gone", {})
+        CountDAO().getURL("/gone", {})
+        self.assertEqual(CountBackend.count, 4)
+
+        # Ok responses still use the cache's lifetime
+        CountDAO().getURL("/ok", {})
+        mock_time.time.return_value = 1060
+        CountDAO().getURL("/ok", {})
+        self.assertEqual(CountBackend.count, 5)
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           "restclients_core.cache.MemoryCache"),
+                       RESTCLIENTS_NEGATIVE_CACHE_TTL=10,
+                       RESTCLIENTS_NEGATIVE_CACHE_STATUS_CODES=[410])
+    def test_status_codes(self):
+        self.assertEqual(CountDAO()._error_status_codes(), [410])
+        CountDAO().getURL("/gone", {})
+        CountDAO().getURL("/gone", {})
+        CountDAO().getURL("/missing", {})
+        CountDAO().getURL("/missing", {})
+        self.assertEqual(CountBackend.count, 3)
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           "restclients_core.tests.test_cache.LegacyCache"),
+                       RESTCLIENTS_NEGATIVE_CACHE_TTL=10,
+                       RESTCLIENTS_CACHE_CONTROL=True)
+    def test_legacy_cache(self):
+        # Caches without a ttl argument keep their own lifetimes
+        CountDAO().getURL("/missing", {})
+        CountDAO().getURL("/missing", {})
+        self.assertEqual(CountBackend.count, 2)
+
+        CountDAO().getURL("/ok", {})
+        response = CountDAO().getURL("/ok", {})
+        self.assertIsInstance(response, CacheHTTP)
+        self.assertEqual(CountBackend.count, 3)
+
+
+@override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                       "restclients_core.cache.MemoryCache"),
+                   RESTCLIENTS_CACHE_CONTROL=True)
+@mock.patch("restclients_core.cache.time")
+class TestCacheControlTTL(TestCase):
+    def setUp(self):
+        DAO._cache_instance = None
+        CountBackend.count = 0
+
+    def tearDown(self):
+        DAO._cache_instance = None
+
+    def test_max_age(self, mock_time):
+        mock_time.time.return_value = 1000
+        HeadersDAO().getURL("/max-age", {})
+        mock_time.time.return_value = 1599
+        HeadersDAO().getURL("/max-age", {})
+        self.assertEqual(CountBackend.count, 1)
+
+        mock_time.time.return_value = 1600
+        HeadersDAO().getURL("/max-age", {})
+        self.assertEqual(CountBackend.count, 2)
+
+    def test_no_store(self, mock_time):
+        mock_time.time.return_value = 1000
+        HeadersDAO().getURL("/no-store", {})
+        HeadersDAO().getURL("/no-store", {})
+        self.assertEqual(CountBackend.count, 2)
+
+    def test_no_headers(self, mock_time):
+        # Falls back to the cache's lifetime
+        mock_time.time.return_value = 1000
+        HeadersDAO().getURL("/ok", {})
+        mock_time.time.return_value = 1059
+        HeadersDAO().getURL("/ok", {})
+        self.assertEqual(CountBackend.count, 1)
+
+        mock_time.time.return_value = 1060
+        HeadersDAO().getURL("/ok", {})
+        self.assertEqual(CountBackend.count, 2)
+
+    def test_settings(self, mock_time):
+        mock_time.time.return_value = 1000
+        with override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                                   "restclients_core.cache.MemoryCache"),
+                               RESTCLIENTS_CACHE_CONTROL=True,
+                               RESTCLIENTS_CACHE_CONTROL_MAX_TTL=100):
+            HeadersDAO().getURL("/max-age", {})
+            self.assertEqual(DAO._cache_instance._entries[
+                ("backend_test", "/max-age")].expires, 1100)
+
+        # Disabled for this service
+        with override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                                   "restclients_core.cache.MemoryCache"),
+                               RESTCLIENTS_CACHE_CONTROL=True,
+                               RESTCLIENTS_BACKEND_TEST_CACHE_CONTROL=False):
+            HeadersDAO().getURL("/no-store", {})
+            HeadersDAO().getURL("/no-store", {})
+            self.assertEqual(CountBackend.count, 2)
+
+
+@override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+    "restclients_core.cache.MemoryCache"))
+class TestCacheKeys(TestCase):
+    def setUp(self):
+        DAO._cache_instance = None
+        CountBackend.count = 0
+
+    def tearDown(self):
+        DAO._cache_instance = None
+
+    def test_default(self):
+        CountDAO().getURL("/api?a=1&b=2", {})
+        CountDAO().getURL("/api?b=2&a=1", {})
+        self.assertEqual(CountBackend.count, 2)
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           "restclients_core.cache.MemoryCache"),
+                       RESTCLIENTS_BACKEND_TEST_CACHE_KEY_NORMALIZE=True)
+    def test_normalize(self):
+        CountDAO().getURL("/api?a=1&b=2", {})
+        response = CountDAO().getURL("/api/?b=2&a=1", {})
+        self.assertEqual(response.data, "count 1")
+        self.assertEqual(CountBackend.count, 1)
+
+        CountDAO().clear_cached_response("/api?b=2&a=%31")
+        CountDAO().getURL("/api?a=1&b=2", {})
+        self.assertEqual(CountBackend.count, 2)
+
+    @override_settings(RESTCLIENTS_DAO_CACHE_CLASS=(
+                           "restclients_core.cache.MemoryCache"),
+                       RESTCLIENTS_CACHE_VARY_HEADERS=["Accept"])
+    def test_vary_headers(self):
+        CountDAO().getURL("/api", {"Accept": "text/plain"})
+        CountDAO().getURL("/api", {"Accept": "text/plain"})
+        CountDAO().getURL("/api", {"Accept": "text/html"})
+        self.assertEqual(CountBackend.count, 2)
+
+        CountDAO().clear_cached_response("/api", {"Accept": "text/html"})
+        CountDAO().getURL("/api", {"Accept": "text/plain"})
+        CountDAO().getURL("/api", {"Accept": "text/html"})
+        self.assertEqual(CountBackend.count, 3)
+
+
+@override_settings(RESTCLIENTS_L2_CACHE_CLASS=(
+    "restclients_core.tests.test_cache.SharedCache"))
+class TestTwoTierCache(TestCase):
+    def setUp(self):
+        SharedCache.lookups = 0
+
+    def test_l2_class(self):
+        cache = TwoTierCache()
+        self.assertIsInstance(cache.l2, SharedCache)
+
+        with override_settings(RESTCLIENTS_L2_CACHE_CLASS=None):
+            self.assertIsInstance(TwoTierCache().l2, NoCache)
+
+        with override_settings(RESTCLIENTS_L2_CACHE_CLASS="x.Cache"):
+            self.assertRaises(ImproperlyConfigured, TwoTierCache)
+
+        with override_settings(
+                RESTCLIENTS_L2_CACHE_CLASS="restclients_core.cache.XCache"):
+            self.assertRaises(ImproperlyConfigured, TwoTierCache)
+
+    def test_write_through(self):
+        cache = TwoTierCache()
+        cache.processResponse("svc", "/ok", make_response())
+        self.assertIsNotNone(cache.l1.getCache("svc", "/ok", {}))
+        self.assertIsNotNone(cache.l2.getCache("svc", "/ok", {}))
+        SharedCache.lookups = 0
+
+        response = cache.getCache("svc", "/ok", {})["response"]
+        self.assertEqual(response.data, "ok")
+        self.assertEqual(SharedCache.lookups, 0)
+
+        cache.deleteCache("svc", "/ok")
+        self.assertIsNone(cache.getCache("svc", "/ok", {}))
+        self.assertEqual(SharedCache.lookups, 1)
+
+    @mock.patch("restclients_core.cache.time")
+    def test_promotion(self, mock_time):
+        mock_time.time.return_value = 1000
+        cache = TwoTierCache()
+        cache.processResponse("svc", "/ok", make_response(
+            headers={"ETag": '"abc"'}))
+
+        # The L1 entry expires first, and is not revalidated
+        mock_time.time.return_value = 1005
+        self.assertIsNone(cache.l1.getCache("svc", "/ok", {}))
+        response = cache.getCache("svc", "/ok", {})["response"]
+        self.assertEqual(response.data, "ok")
+        self.assertEqual(SharedCache.lookups, 1)
+
+        # Promoted from L2
+        response = cache.getCache("svc", "/ok", {})["response"]
+        self.assertEqual(SharedCache.lookups, 1)
+
+    @override_settings(RESTCLIENTS_L2_CACHE_CLASS=(
+                           "restclients_core.tests.test_cache.SharedCache"),
+                       RESTCLIENTS_SVC_L1_CACHE_TTL=0)
+    def test_l1_ttl(self):
+        cache = TwoTierCache()
+        cache.processResponse("svc", "/ok", make_response())
+        self.assertIsNone(cache.l1.getCache("svc", "/ok", {}))
+        self.assertIsNotNone(cache.getCache("svc", "/ok", {}))
+        self.assertEqual(SharedCache.lookups, 1)
+
+    @mock.patch("restclients_core.cache.time")
+    def test_explicit_ttl(self, mock_time):
+        mock_time.time.return_value = 1000
+        cache = TwoTierCache()
+        cache.processResponse("svc", "/missing", make_response(status=404),
+                              ttl=30)
+        self.assertEqual(cache.l1._entries[("svc", "/missing")].expires, 1005)
+        self.assertEqual(cache.l2._entries[("svc", "/missing")].expires, 1030)
+
+        with override_settings(RESTCLIENTS_L2_CACHE_CLASS=(
+                "restclients_core.tests.test_cache.LegacyCache")):
+            cache = TwoTierCache()
+        cache.processResponse("svc", "/missing", make_response(status=404),
+                              ttl=30)
+        self.assertIn(("svc", "/missing"), cache.l1._entries)
+        self.assertNotIn(("svc", "/missing"), cache.l2._entries)
+
+    @override_settings(RESTCLIENTS_L2_CACHE_CLASS=(
+                           "restclients_core.tests.test_cache.SharedCache"),
+                       RESTCLIENTS_L1_CACHE_MAX_ENTRIES=1)
+    def test_l1_size(self):
+        cache = TwoTierCache()
+        self.assertEqual(cache.l1.max_entries, 1)
+        self.assertEqual(cache.l2.max_entries, 1000)
+
+
+class TestDiskCache(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            RESTCLIENTS_DISK_CACHE_DIR=self.temp_dir.name)
+        self.settings.__enter__()
+
+    def tearDown(self):
+        self.settings.__exit__()
+        self.temp_dir.cleanup()
+
+    def test_store_and_get(self):
+        cache = DiskCache()
+        self.assertIsNone(cache.getCache("svc", "/ok", {}))
+
+        cache.processResponse("svc", "/ok", make_response(
+            b"binary", headers={"Content-Type": "application/json"}))
+        cache.processResponse("svc", "/text", make_response("text"))
+        cache.processResponse("svc", "/err", make_response(status=500))
+
+        response = cache.getCache("svc", "/ok", {})["response"]
+        self.assertIsInstance(response, MappedCacheHTTP)
+        self.assertEqual(response.get_cache_class(), DiskCache)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.data, b"binary")
+        self.assertEqual(response.read(), b"binary")
+        self.assertEqual(response.getheader("content-type"),
+                         "application/json")
+
+        response = cache.getCache("svc", "/text", {})["response"]
+        self.assertEqual(response.data, "text")
+
+        self.assertIsNone(cache.getCache("svc", "/err", {}))
+        self.assertIsNone(cache.getCache("svc2", "/ok", {}))
+
+    def test_default_path(self):
+        with override_settings(RESTCLIENTS_DISK_CACHE_DIR=None), \
+                mock.patch("tempfile.gettempdir") as mock_temp_dir:
+            mock_temp_dir.return_value = self.temp_dir.name
+            cache = DiskCache()
+        self.assertEqual(cache.path, os.path.join(
+            self.temp_dir.name, "restclients_cache_{}".format(os.getuid())))
+        self.assertEqual(os.stat(cache.path).st_mode & 0o777, 0o700)
+
+    def test_unsafe_path(self):
+        path = os.path.join(self.temp_dir.name, "shared")
+        os.mkdir(path)
+        os.chmod(path, 0o777)
+        with override_settings(RESTCLIENTS_DISK_CACHE_DIR=path):
+            self.assertRaises(ImproperlyConfigured, DiskCache)
+
+            os.chmod(path, 0o700)
+            with mock.patch("os.getuid", return_value=os.getuid() + 1):
+                self.assertRaises(ImproperlyConfigured, DiskCache)
+
+        link = os.path.join(self.temp_dir.name, "link")
+        os.symlink(path, link)
+        with override_settings(RESTCLIENTS_DISK_CACHE_DIR=link):
+            self.assertRaises(ImproperlyConfigured, DiskCache)
+
+    def test_persistent(self):
+        DiskCache().processResponse("svc", "/ok", make_response(b"ok"))
+        response = DiskCache().getCache("svc", "/ok", {})["response"]
+        self.assertEqual(response.data, b"ok")
+
+    def test_delete(self):
+        cache = DiskCache()
+        cache.processResponse("svc", "/ok", make_response(b"ok"))
+        cache.deleteCache("svc", "/ok")
+        self.assertIsNone(cache.getCache("svc", "/ok", {}))
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+        # Deleting a missing entry
+        cache.deleteCache("svc", "/ok")
+
+    @mock.patch("restclients_core.cache.time")
+    def test_expiration(self, mock_time):
+        mock_time.time.return_value = 1000
+        cache = DiskCache()
+        cache.processResponse("svc", "/ok", make_response(b"ok"))
+
+        mock_time.time.return_value = 1059
+        self.assertIsNotNone(cache.getCache("svc", "/ok", {}))
+
+        mock_time.time.return_value = 1060
+        self.assertIsNone(cache.getCache("svc", "/ok", {}))
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_sweep_expired(self):
+        cache = DiskCache()
+        cache.processResponse("svc", "/old", make_response(b"old"), ttl=1)
+        cache.processResponse("svc", "/new", make_response(b"new"))
+        old_path = cache._get_file_path("svc", "/old")
+        os.utime(old_path, (time.time(), time.time() - 1))
+
+        # Files that are never requested again are removed by the next sweep
+        cache.processResponse("svc", "/other", make_response(b"other"))
+        self.assertTrue(os.path.exists(old_path))
+        cache.sweep()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 2)
+
+    def test_sweep_interval(self):
+        with override_settings(RESTCLIENTS_DISK_CACHE_DIR=self.temp_dir.name,
+                               RESTCLIENTS_DISK_CACHE_SWEEP_INTERVAL=0):
+            cache = DiskCache()
+        cache.processResponse("svc", "/old", make_response(b"old"))
+        os.utime(cache._get_file_path("svc", "/old"), (0, 0))
+
+        cache.processResponse("svc", "/new", make_response(b"new"))
+        self.assertEqual(os.listdir(self.temp_dir.name),
+                         [os.path.basename(
+                             cache._get_file_path("svc", "/new"))])
+
+    def test_max_entries(self):
+        with override_settings(RESTCLIENTS_DISK_CACHE_DIR=self.temp_dir.name,
+                               RESTCLIENTS_DISK_CACHE_MAX_ENTRIES=2):
+            cache = DiskCache()
+        cache.processResponse("svc", "/1", make_response(b"1"), ttl=10)
+        cache.processResponse("svc", "/2", make_response(b"2"), ttl=30)
+        cache.processResponse("svc", "/3", make_response(b"3"), ttl=20)
+
+        # The file closest to expiring is removed
+        self.assertIsNone(cache.getCache("svc", "/1", {}))
+        self.assertIsNotNone(cache.getCache("svc", "/2", {}))
+        self.assertIsNotNone(cache.getCache("svc", "/3", {}))
+        self.assertEqual(len(os.listdir(self.temp_dir.name)), 2)
+
+    def test_max_bytes(self):
+        with override_settings(RESTCLIENTS_DISK_CACHE_DIR=self.temp_dir.name,
+                               RESTCLIENTS_DISK_CACHE_MAX_BYTES=500):
+            cache = DiskCache()
+        cache.processResponse("svc", "/1", make_response(b"1" * 300), ttl=10)
+        cache.processResponse("svc", "/2", make_response(b"2" * 300), ttl=20)
+
+        self.assertIsNone(cache.getCache("svc", "/1", {}))
+        self.assertIsNotNone(cache.getCache("svc", "/2", {}))
+
+    def test_explicit_ttl(self):
+        cache = DiskCache()
+        cache.processResponse("svc", "/missing", make_response(status=404),
+                              ttl=10)
+        response = cache.getCache("svc", "/missing", {})["response"]
+        self.assertEqual(response.status, 404)
+
+    def test_compression(self):
+        body = b"compressible " * 100
+        cache = DiskCache()
+        with override_settings(RESTCLIENTS_DISK_CACHE_DIR=self.temp_dir.name,
+                               RESTCLIENTS_CACHE_COMPRESS_MIN_SIZE=100):
+            cache.processResponse("svc", "/large", make_response(body))
+            cache.processResponse("svc", "/text", make_response(
+                body.decode("utf-8")))
+
+        self.assertLess(os.path.getsize(
+            cache._get_file_path("svc", "/large")), 200)
+
+        response = cache.getCache("svc", "/large", {})["response"]
+        self.assertIsInstance(response, CompressedCacheHTTP)
+        self.assertEqual(response.get_cache_class(), DiskCache)
+        self.assertEqual(response.data, body)
+
+        response = cache.getCache("svc", "/text", {})["response"]
+        self.assertEqual(response.data, body.decode("utf-8"))
+
+    def test_corrupt_file(self):
+        cache = DiskCache()
+        for content in [b"", b"not json", b"{}\nbody"]:
+            with open(cache._get_file_path("svc", "/ok"), "wb") as handle:
+                handle.write(content)
+            self.assertIsNone(cache.getCache("svc", "/ok", {}))
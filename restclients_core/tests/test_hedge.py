@@ -0,0 +1,116 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from commonconf import override_settings
+from restclients_core.dao import DAO, MockDAO
+from restclients_core.models import MockHTTP
+from restclients_core.exceptions import DataFailureException
+from restclients_core.util.budget import RequestBudget
+from restclients_core.thread import GenericPrefetchThread
+from restclients_core.tests.dao_implementation.test_backend import TDAO
+from prometheus_client import REGISTRY
+from threading import Lock
+import mock
+import time
+
+
+class HedgeDAO(TDAO):
+    def get_default_service_setting(self, key):
+        if "DAO_CLASS" == key:
+            return ("restclients_core.tests.test_hedge.HedgeBackend")
+
+
+class HedgeBackend(MockDAO):
+    """
+    The first request is slow, later ones are fast.  Requests for /error
+    fail.
+    """
+    lock = Lock()
+    count = 0
+
+    def load(self, method, url, headers, body):
+        with HedgeBackend.lock:
+            HedgeBackend.count += 1
+            count = HedgeBackend.count
+
+        if count == 1:
+            time.sleep(0.3)
+            if url == "/error":
+                raise DataFailureException(url, 500, "error")
+
+        response = MockHTTP()
+        response.status = 200
+        response.data = "response {}".format(count)
+        return response
+
+
+def get_counts():
+    return [REGISTRY.get_sample_value(
+        "restclient_request_{}_total".format(name),
+        {"service": "backend_test"}) or 0 for name in ("hedged", "hedge_won")]
+
+
+@override_settings(RESTCLIENTS_USE_THREADING=True,
+                   RESTCLIENTS_BACKEND_TEST_HEDGE_REQUESTS=True,
+                   RESTCLIENTS_BACKEND_TEST_HEDGE_DELAY=0.05)
+class TestHedgedRequests(TestCase):
+    def setUp(self):
+        DAO._cache_instance = None
+        DAO._hedge_budgets = {}
+        DAO._hedge_latencies = {}
+        HedgeBackend.count = 0
+
+    def test_hedge_wins(self):
+        hedged, won = get_counts()
+        response = HedgeDAO().getURL("/ok")
+        self.assertEqual(response.data, "response 2")
+        self.assertEqual(HedgeBackend.count, 2)
+        self.assertEqual(get_counts(), [hedged + 1, won + 1])
+
+    def test_failed_request(self):
+        response = HedgeDAO().getURL("/error")
+        self.assertEqual(response.data, "response 2")
+
+    def test_fast_response(self):
+        HedgeBackend.count = 1
+        hedged, won = get_counts()
+        response = HedgeDAO().getURL("/ok")
+        self.assertEqual(response.data, "response 2")
+        self.assertEqual(get_counts(), [hedged, won])
+
+    def test_budget(self):
+        with mock.patch.object(HedgeDAO, "_create_hedge_budget",
+                               return_value=RequestBudget(0.1, max_tokens=0)):
+            response = HedgeDAO().getURL("/ok")
+        self.assertEqual(response.data, "response 1")
+        self.assertEqual(HedgeBackend.count, 1)
+
+    def test_post(self):
+        response = HedgeDAO().postURL("/ok")
+        self.assertEqual(HedgeBackend.count, 1)
+
+    def test_threading_disabled(self):
+        with override_settings(RESTCLIENTS_BACKEND_TEST_HEDGE_REQUESTS=True,
+                               RESTCLIENTS_BACKEND_TEST_HEDGE_DELAY=0.05):
+            response = HedgeDAO().getURL("/ok")
+        self.assertEqual(response.data, "response 1")
+        self.assertEqual(HedgeBackend.count, 1)
+
+    def test_observed_delay(self):
+        with override_settings(RESTCLIENTS_USE_THREADING=True,
+                               RESTCLIENTS_BACKEND_TEST_HEDGE_REQUESTS=True):
+            # Not enough response times to hedge, so no thread is started
+            with mock.patch.object(GenericPrefetchThread,
+                                   "start") as mock_start:
+                response = HedgeDAO().getURL("/ok")
+                self.assertEqual(mock_start.call_count, 0)
+            self.assertEqual(response.data, "response 1")
+
+            for i in range(19):
+                HedgeDAO().getURL("/ok")
+            self.assertEqual(len(HedgeDAO()._get_hedge_latencies()), 20)
+
+            HedgeBackend.count = 0
+            response = HedgeDAO().getURL("/ok")
+            self.assertEqual(response.data, "response 2")
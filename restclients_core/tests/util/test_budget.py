@@ -0,0 +1,24 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.budget import RequestBudget
+
+
+class TestRequestBudget(TestCase):
+    def test_budget(self):
+        budget = RequestBudget(0.5, max_tokens=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+    def test_max_tokens(self):
+        budget = RequestBudget(1, max_tokens=2)
+        for i in range(5):
+            budget.deposit()
+        self.assertEqual(budget.tokens, 2)
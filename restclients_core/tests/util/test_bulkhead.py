@@ -0,0 +1,46 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.bulkhead import Bulkhead
+from threading import Thread
+import time
+
+
+class TestBulkhead(TestCase):
+    def test_limit(self):
+        changes = []
+        bulkhead = Bulkhead(2, on_change=lambda *args: changes.append(args))
+        self.assertTrue(bulkhead.acquire())
+        self.assertTrue(bulkhead.acquire())
+        self.assertFalse(bulkhead.acquire(1))
+
+        bulkhead.release()
+        self.assertTrue(bulkhead.acquire())
+        self.assertEqual(changes, [(1, 0), (2, 0), (1, 0), (2, 0)])
+
+    def test_queue(self):
+        bulkhead = Bulkhead(1, max_queued=1)
+        self.assertTrue(bulkhead.acquire())
+
+        results = []
+        thread = Thread(target=lambda: results.append(bulkhead.acquire(5)))
+        thread.start()
+        time.sleep(0.05)
+        self.assertEqual(bulkhead.queued, 1)
+
+        # The queue is full
+        self.assertFalse(bulkhead.acquire(5))
+
+        bulkhead.release()
+        thread.join()
+        self.assertEqual(results, [True])
+        self.assertEqual(bulkhead.in_flight, 1)
+        self.assertEqual(bulkhead.queued, 0)
+
+    def test_queue_timeout(self):
+        bulkhead = Bulkhead(1, max_queued=1)
+        self.assertTrue(bulkhead.acquire())
+        self.assertFalse(bulkhead.acquire(0.05))
+        self.assertEqual(bulkhead.queued, 0)
+        self.assertEqual(bulkhead.in_flight, 1)
@@ -0,0 +1,71 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.cache_control import (
+    get_header, parse_cache_control, get_freshness_lifetime)
+import mock
+
+
+class TestCacheControl(TestCase):
+    def test_get_header(self):
+        headers = {"Cache-Control": "max-age=5"}
+        self.assertEqual(get_header(headers, "cache-control"), "max-age=5")
+        self.assertEqual(get_header(headers, "Expires"), None)
+        self.assertEqual(get_header(None, "Expires", "x"), "x")
+
+    def test_parse(self):
+        self.assertEqual(parse_cache_control(None), {})
+        self.assertEqual(
+            parse_cache_control('Public, max-age=60 , s-maxage="30",'),
+            {"public": None, "max-age": "60", "s-maxage": "30"})
+
+    def test_no_headers(self):
+        self.assertIsNone(get_freshness_lifetime(None))
+        self.assertIsNone(get_freshness_lifetime({}))
+        self.assertIsNone(get_freshness_lifetime({
+            "Cache-Control": "public"}))
+
+    def test_not_storable(self):
+        for value in ["no-store", "private, max-age=60",
+                      "no-cache", "max-age=60, no-store"]:
+            self.assertEqual(get_freshness_lifetime(
+                {"Cache-Control": value}), 0, value)
+
+    def test_max_age(self):
+        self.assertEqual(get_freshness_lifetime({
+            "cache-control": "max-age=60"}), 60)
+        self.assertEqual(get_freshness_lifetime({
+            "Cache-Control": "max-age=60, s-maxage=10"}), 10)
+        self.assertEqual(get_freshness_lifetime({
+            "Cache-Control": "max-age=abc"}), 0)
+        self.assertEqual(get_freshness_lifetime({
+            "Cache-Control": "max-age=-5"}), 0)
+
+        # max-age takes precedence over Expires
+        self.assertEqual(get_freshness_lifetime({
+            "Cache-Control": "max-age=60",
+            "Expires": "Thu, 01 Dec 1994 16:00:00 GMT"}), 60)
+
+    def test_max_lifetime(self):
+        self.assertEqual(get_freshness_lifetime({
+            "Cache-Control": "max-age=60"}, 30), 30)
+        self.assertEqual(get_freshness_lifetime({
+            "Cache-Control": "max-age=10"}, 30), 10)
+        self.assertIsNone(get_freshness_lifetime({}, 30))
+
+    def test_expires(self):
+        self.assertEqual(get_freshness_lifetime({
+            "Date": "Wed, 21 Oct 2015 07:28:00 GMT",
+            "Expires": "Wed, 21 Oct 2015 07:38:00 GMT"}), 600)
+        self.assertEqual(get_freshness_lifetime({
+            "Date": "Wed, 21 Oct 2015 07:28:00 GMT",
+            "Expires": "Wed, 21 Oct 2015 07:18:00 GMT"}), 0)
+        self.assertEqual(get_freshness_lifetime({"Expires": "0"}), 0)
+
+    @mock.patch("restclients_core.util.cache_control.time")
+    def test_expires_without_date(self, mock_time):
+        mock_time.time.return_value = 1445412780
+        self.assertEqual(get_freshness_lifetime({
+            "Expires": "Wed, 21 Oct 2015 07:38:00 GMT",
+            "Date": "invalid"}), 300)
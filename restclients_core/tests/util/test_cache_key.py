@@ -0,0 +1,54 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.cache_key import normalize_url, get_cache_key
+
+
+class TestCacheKey(TestCase):
+    def test_query_order(self):
+        self.assertEqual(normalize_url("/api?b=2&a=1"), "/api?a=1&b=2")
+        self.assertEqual(normalize_url("/api?a=1&b=2"), "/api?a=1&b=2")
+
+        # Repeated parameters keep their order
+        self.assertEqual(normalize_url("/api?b=2&a=3&a=1"),
+                         "/api?a=3&a=1&b=2")
+        self.assertEqual(normalize_url("/api?flag&a="), "/api?a=&flag=")
+
+    def test_encoding(self):
+        self.assertEqual(normalize_url("/api/%7ejoe/%2f%2F"),
+                         "/api/~joe/%2F%2F")
+        self.assertEqual(normalize_url("/api?name=a%20b"),
+                         normalize_url("/api?name=a+b"))
+        self.assertEqual(normalize_url("/api?name=%41"), "/api?name=A")
+
+    def test_trailing_slash(self):
+        self.assertEqual(normalize_url("/api/"), "/api")
+        self.assertEqual(normalize_url("/api//?a=1"), "/api?a=1")
+        self.assertEqual(normalize_url("/"), "/")
+
+    def test_absolute(self):
+        self.assertEqual(normalize_url("HTTPS://Example.EDU/api/#frag"),
+                         "https://example.edu/api")
+
+    def test_cache_key(self):
+        self.assertEqual(get_cache_key("/api?b=2&a=1"), "/api?b=2&a=1")
+        self.assertEqual(get_cache_key("/api?b=2&a=1", normalize=True),
+                         "/api?a=1&b=2")
+
+    def test_vary_headers(self):
+        vary = ["Authorization", "accept"]
+        key1 = get_cache_key("/api", {"Authorization": "Bearer 1"},
+                             vary_headers=vary)
+        key2 = get_cache_key("/api", {"authorization": "Bearer 1",
+                                      "X-Other": "x"}, vary_headers=vary)
+        key3 = get_cache_key("/api", {"Authorization": "Bearer 2"},
+                             vary_headers=vary)
+        key4 = get_cache_key("/api", {}, vary_headers=vary)
+
+        self.assertTrue(key1.startswith("/api#vary="))
+        self.assertNotIn("Bearer", key1)
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+        self.assertNotEqual(key1, key4)
+        self.assertEqual(get_cache_key("/api", None, vary_headers=vary), key4)
@@ -0,0 +1,73 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.circuit import (
+    CircuitBreaker, CLOSED, OPEN, HALF_OPEN)
+import mock
+
+
+@mock.patch("restclients_core.util.circuit.time")
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        self.transitions = []
+        self.circuit_breaker = CircuitBreaker(
+            3, 30, on_transition=self.transitions.append)
+
+    def _fail(self, count):
+        for i in range(count):
+            self.assertTrue(self.circuit_breaker.allow_request())
+            self.circuit_breaker.record_failure()
+
+    def test_consecutive_failures(self, mock_time):
+        mock_time.time.return_value = 100
+        self._fail(2)
+        self.circuit_breaker.record_success()
+        self._fail(2)
+        self.assertEqual(self.circuit_breaker.state, CLOSED)
+
+        self._fail(1)
+        self.assertEqual(self.circuit_breaker.state, OPEN)
+        self.assertFalse(self.circuit_breaker.allow_request())
+        self.assertEqual(self.transitions, [OPEN])
+
+    def test_half_open_success(self, mock_time):
+        mock_time.time.return_value = 100
+        self._fail(3)
+
+        mock_time.time.return_value = 129
+        self.assertFalse(self.circuit_breaker.allow_request())
+
+        mock_time.time.return_value = 130
+        self.assertTrue(self.circuit_breaker.allow_request())
+        self.assertEqual(self.circuit_breaker.state, HALF_OPEN)
+
+        # Only one probe at a time
+        self.assertFalse(self.circuit_breaker.allow_request())
+
+        self.circuit_breaker.record_success()
+        self.assertEqual(self.circuit_breaker.state, CLOSED)
+        self.assertTrue(self.circuit_breaker.allow_request())
+        self.assertEqual(self.transitions, [OPEN, HALF_OPEN, CLOSED])
+
+    def test_half_open_failure(self, mock_time):
+        mock_time.time.return_value = 100
+        self._fail(3)
+
+        mock_time.time.return_value = 130
+        self._fail(1)
+        self.assertEqual(self.circuit_breaker.state, OPEN)
+
+        mock_time.time.return_value = 159
+        self.assertFalse(self.circuit_breaker.allow_request())
+        self.assertEqual(self.transitions, [OPEN, HALF_OPEN, OPEN])
+
+    def test_cancel_request(self, mock_time):
+        mock_time.time.return_value = 100
+        self._fail(3)
+
+        mock_time.time.return_value = 130
+        self.assertTrue(self.circuit_breaker.allow_request())
+        self.circuit_breaker.cancel_request()
+        self.assertEqual(self.circuit_breaker.state, HALF_OPEN)
+        self.assertTrue(self.circuit_breaker.allow_request())
@@ -0,0 +1,179 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from commonconf import override_settings
+from restclients_core.dao import DAO, MockDAO
+from restclients_core.models import MockHTTP
+from restclients_core.util.coalesce import SingleFlight, AsyncSingleFlight
+from restclients_core.tests.dao_implementation.test_backend import TDAO
+from prometheus_client import REGISTRY
+from threading import Event, Thread
+import asyncio
+import time
+
+
+class SlowDAO(TDAO):
+    def get_default_service_setting(self, key):
+        if "DAO_CLASS" == key:
+            return ("restclients_core.tests.util.test_coalesce.SlowBackend")
+
+
+class SlowBackend(MockDAO):
+    count = 0
+    release = Event()
+
+    def load(self, method, url, headers, body):
+        SlowBackend.count += 1
+        SlowBackend.release.wait(5)
+        response = MockHTTP()
+        response.status = 200
+        response.data = "ok"
+        return response
+
+
+def run_threads(target, count):
+    threads = [Thread(target=target) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+class TestSingleFlight(TestCase):
+    def test_single_call(self):
+        value, shared = SingleFlight().call("key", lambda x: x + 1, 1)
+        self.assertEqual(value, 2)
+        self.assertFalse(shared)
+
+    def test_concurrent_calls(self):
+        flight = SingleFlight()
+        release = Event()
+        results = []
+        calls = []
+
+        def method():
+            calls.append(1)
+            release.wait(5)
+            return "value"
+
+        threads = run_threads(
+            lambda: results.append(flight.call("key", method)), 5)
+
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [("value", False)] +
+                         [("value", True)] * 4)
+        self.assertEqual(flight._calls, {})
+
+    def test_shared_exception(self):
+        flight = SingleFlight()
+        release = Event()
+        errors = []
+
+        def method():
+            release.wait(5)
+            raise ValueError("failed")
+
+        def target():
+            try:
+                flight.call("key", method)
+            except ValueError as ex:
+                errors.append(ex)
+
+        threads = run_threads(target, 3)
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(flight._calls, {})
+
+
+class TestAsyncSingleFlight(TestCase):
+    def test_concurrent_calls(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def method():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        async def main():
+            return await asyncio.gather(
+                *[flight.call("key", method) for i in range(5)])
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [("value", False)] +
+                         [("value", True)] * 4)
+
+    def test_shared_exception(self):
+        flight = AsyncSingleFlight()
+
+        async def method():
+            await asyncio.sleep(0.05)
+            raise ValueError("failed")
+
+        async def main():
+            return await asyncio.gather(
+                *[flight.call("key", method) for i in range(3)],
+                return_exceptions=True)
+
+        errors = asyncio.run(main())
+        self.assertEqual(len(errors), 3)
+        for error in errors:
+            self.assertIsInstance(error, ValueError)
+
+
+class TestCoalescedRequests(TestCase):
+    def setUp(self):
+        DAO._cache_instance = None
+        SlowBackend.count = 0
+        SlowBackend.release.clear()
+
+    def _get_responses(self, url, count):
+        responses = []
+        threads = run_threads(
+            lambda: responses.append(SlowDAO().getURL(url, {})), count)
+        time.sleep(0.1)
+        SlowBackend.release.set()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_not_coalesced(self):
+        responses = self._get_responses("/ok", 3)
+        self.assertEqual(len(responses), 3)
+        self.assertEqual(SlowBackend.count, 3)
+
+    @override_settings(RESTCLIENTS_BACKEND_TEST_COALESCE_REQUESTS=True)
+    def test_coalesced(self):
+        before = REGISTRY.get_sample_value(
+            "restclient_request_coalesced_total",
+            {"service": "backend_test"}) or 0
+
+        responses = self._get_responses("/coalesce", 4)
+        self.assertEqual(len(responses), 4)
+        self.assertEqual(SlowBackend.count, 1)
+        for response in responses:
+            self.assertEqual(response.data, "ok")
+
+        after = REGISTRY.get_sample_value(
+            "restclient_request_coalesced_total",
+            {"service": "backend_test"})
+        self.assertEqual(after - before, 3)
+
+    @override_settings(RESTCLIENTS_BACKEND_TEST_COALESCE_REQUESTS=True)
+    def test_post_not_coalesced(self):
+        threads = run_threads(lambda: SlowDAO().postURL("/ok", {}), 2)
+        time.sleep(0.1)
+        SlowBackend.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(SlowBackend.count, 2)
@@ -0,0 +1,53 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.compression import (
+    compress_body, decompress_body, CompressedCacheHTTP)
+from prometheus_client import REGISTRY
+import mock
+import zlib
+
+BODY = b'{"name": "value"}' * 100
+
+
+class TestCompression(TestCase):
+    def test_compress(self):
+        body, encoding = compress_body("svc", BODY, 100)
+        self.assertIsNone(encoding)
+        self.assertLess(len(body), len(BODY))
+        self.assertEqual(decompress_body("svc", body), BODY)
+
+        body, encoding = compress_body("svc", BODY.decode("utf-8"), 100)
+        self.assertEqual(encoding, "utf-8")
+        self.assertEqual(decompress_body("svc", body, encoding),
+                         BODY.decode("utf-8"))
+
+    def test_skip(self):
+        self.assertIsNone(compress_body("svc", BODY, len(BODY) + 1))
+        self.assertIsNone(compress_body("svc", b"", 0))
+        self.assertIsNone(compress_body("svc", None, 0))
+
+        # Not worth compressing
+        self.assertIsNone(compress_body("svc", b"abc", 0))
+
+    def test_metrics(self):
+        compress_body("metrics_svc", BODY, 100)
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_cache_compression_ratio_count",
+            {"service": "metrics_svc"}), 1)
+        self.assertGreater(REGISTRY.get_sample_value(
+            "restclient_cache_compression_ratio_sum",
+            {"service": "metrics_svc"}), 8)
+        self.assertEqual(REGISTRY.get_sample_value(
+            "restclient_cache_compression_cpu_seconds_count",
+            {"service": "metrics_svc", "operation": "compress"}), 1)
+
+    def test_lazy_response(self):
+        with mock.patch("restclients_core.util.compression.zlib") as z:
+            z.decompress.return_value = BODY
+            response = CompressedCacheHTTP("svc", zlib.compress(BODY))
+            self.assertEqual(z.decompress.call_count, 0)
+            self.assertEqual(response.read(), BODY)
+            self.assertEqual(response.data, BODY)
+            self.assertEqual(z.decompress.call_count, 1)
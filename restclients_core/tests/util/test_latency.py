@@ -0,0 +1,28 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.latency import LatencyWindow
+
+
+class TestLatencyWindow(TestCase):
+    def test_percentile(self):
+        window = LatencyWindow(100)
+        self.assertIsNone(window.percentile(99))
+
+        for i in range(1, 101):
+            window.add(i / 100.0)
+
+        self.assertEqual(len(window), 100)
+        self.assertEqual(window.percentile(50), 0.5)
+        self.assertEqual(window.percentile(99), 0.99)
+        self.assertEqual(window.percentile(100), 1.0)
+        self.assertEqual(window.percentile(0), 0.01)
+
+    def test_window_size(self):
+        window = LatencyWindow(3)
+        for seconds in [10, 1, 2, 3]:
+            window.add(seconds)
+
+        self.assertEqual(len(window), 3)
+        self.assertEqual(window.percentile(100), 3)
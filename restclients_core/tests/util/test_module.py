@@ -0,0 +1,27 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.module import get_class
+from restclients_core.exceptions import ImproperlyConfigured
+from restclients_core.cache import MemoryCache
+import mock
+
+
+class TestGetClass(TestCase):
+    def test_get_class(self):
+        self.assertIs(get_class("restclients_core.cache.MemoryCache"),
+                      MemoryCache)
+
+        # Only imported once
+        with mock.patch(
+                "restclients_core.util.module.import_module") as mock_import:
+            self.assertIs(get_class("restclients_core.cache.MemoryCache"),
+                          MemoryCache)
+            self.assertEqual(mock_import.call_count, 0)
+
+    def test_errors(self):
+        self.assertRaises(ImproperlyConfigured, get_class,
+                          "restclients_core.missing.Cache")
+        self.assertRaises(ImproperlyConfigured, get_class,
+                          "restclients_core.cache.MissingCache")
@@ -0,0 +1,41 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.rate_limit import RateLimiter
+import mock
+
+
+@mock.patch("restclients_core.util.rate_limit.time")
+class TestRateLimiter(TestCase):
+    def test_burst(self, mock_time):
+        mock_time.monotonic.return_value = 100
+        rate_limiter = RateLimiter(2, burst=3)
+        for i in range(3):
+            self.assertEqual(rate_limiter.reserve(), 0)
+        self.assertIsNone(rate_limiter.reserve())
+
+        # Refills at the rate
+        mock_time.monotonic.return_value = 100.5
+        self.assertEqual(rate_limiter.reserve(), 0)
+        self.assertIsNone(rate_limiter.reserve())
+
+        mock_time.monotonic.return_value = 1000
+        for i in range(3):
+            self.assertEqual(rate_limiter.reserve(), 0)
+        self.assertIsNone(rate_limiter.reserve())
+
+    def test_blocking(self, mock_time):
+        mock_time.monotonic.return_value = 100
+        rate_limiter = RateLimiter(2)
+        self.assertEqual(rate_limiter.burst, 2)
+        for i in range(2):
+            self.assertEqual(rate_limiter.reserve(1), 0)
+
+        # Waiting callers are spaced out at the rate
+        self.assertEqual(rate_limiter.reserve(1), 0.5)
+        self.assertEqual(rate_limiter.reserve(1), 1)
+        self.assertIsNone(rate_limiter.reserve(1))
+
+        mock_time.monotonic.return_value = 101
+        self.assertEqual(rate_limiter.reserve(1), 0.5)
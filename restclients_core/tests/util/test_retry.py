@@ -4,6 +4,7 @@
 from unittest import TestCase
 from restclients_core.exceptions import DataFailureException
 from restclients_core.util.retry import retry
+import mock
 
 
 class RetryableError(Exception):
@@ -180,3 +181,20 @@ class RetryTest(TestCase):
         r = raise_multiple_exceptions()
         self.assertEqual(r, 'success')
         self.assertEqual(self.counter, 4)
+
+    @mock.patch('restclients_core.util.retry.time.sleep')
+    @mock.patch('restclients_core.util.retry.random.uniform')
+    def test_jitter(self, mock_uniform, mock_sleep):
+        self.counter = 0
+        mock_uniform.side_effect = lambda a, b: b / 2
+
+        @retry(RetryableError, tries=3, delay=1, backoff=2, jitter=True)
+        def fails_twice():
+            self.counter += 1
+            if self.counter < 3:
+                raise RetryableError('failed')
+            return 'success'
+
+        self.assertEqual(fails_twice(), 'success')
+        mock_uniform.assert_has_calls([mock.call(0, 1), mock.call(0, 2)])
+        mock_sleep.assert_has_calls([mock.call(0.5), mock.call(1)])
@@ -0,0 +1,47 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from commonconf import override_settings
+from commonconf.proxy import ConfProxy
+from restclients_core.util.settings import (
+    get_service_settings, clear_settings_cache)
+import mock
+
+
+class TestServiceSettings(TestCase):
+    @override_settings(RESTCLIENTS_FOO="global",
+                       RESTCLIENTS_TEST_FOO="service",
+                       RESTCLIENTS_TEST_NONE=None,
+                       RESTCLIENTS_NONE="global")
+    def test_lookup_order(self):
+        service_settings = get_service_settings("test")
+        self.assertEqual(service_settings.get("FOO"), "service")
+        self.assertEqual(service_settings.get("NONE", "default"), None)
+        self.assertEqual(service_settings.get("BAR", "default"), "default")
+        self.assertEqual(get_service_settings("other").get("FOO"), "global")
+        self.assertEqual(get_service_settings().get("FOO"), "global")
+        self.assertEqual(get_service_settings().get("TEST_FOO"), "service")
+
+    @override_settings(RESTCLIENTS_TEST_FOO="service")
+    def test_cached(self):
+        service_settings = get_service_settings("test")
+        self.assertIs(get_service_settings("test"), service_settings)
+
+        with mock.patch.object(ConfProxy, "__getattr__", autospec=True,
+                               side_effect=ConfProxy.__getattr__) as mock_get:
+            for i in range(3):
+                self.assertEqual(service_settings.get("FOO"), "service")
+                self.assertEqual(service_settings.get("BAR"), None)
+            self.assertEqual(mock_get.call_count, 3)
+
+    def test_invalidated(self):
+        with override_settings(RESTCLIENTS_TEST_FOO="first"):
+            self.assertEqual(get_service_settings("test").get("FOO"), "first")
+        with override_settings(RESTCLIENTS_TEST_FOO="second"):
+            service_settings = get_service_settings("test")
+            self.assertEqual(service_settings.get("FOO"), "second")
+
+            clear_settings_cache()
+            self.assertIsNot(get_service_settings("test"), service_settings)
+        self.assertEqual(get_service_settings("test").get("FOO"), None)
@@ -0,0 +1,24 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest import TestCase
+from restclients_core.util.ssl_context import get_ssl_context
+import ssl
+
+
+class TestSSLContext(TestCase):
+    def test_shared(self):
+        context = get_ssl_context(ssl.PROTOCOL_TLS, "CERT_REQUIRED")
+        self.assertIsInstance(context, ssl.SSLContext)
+        self.assertEqual(context.verify_mode, ssl.CERT_REQUIRED)
+        self.assertIs(
+            get_ssl_context(ssl.PROTOCOL_TLS, "CERT_REQUIRED"), context)
+
+        other = get_ssl_context(ssl.PROTOCOL_TLS, "CERT_NONE")
+        self.assertIsNot(other, context)
+        self.assertEqual(other.verify_mode, ssl.CERT_NONE)
+        self.assertFalse(other.check_hostname)
+
+    def test_missing_file(self):
+        self.assertRaises(OSError, get_ssl_context, ssl.PROTOCOL_TLS,
+                          "CERT_REQUIRED", ca_certs="/missing/ca.pem")
@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from commonconf import settings
+from queue import Empty
 import threading
 
 try:
@@ -85,6 +86,32 @@ class GenericPrefetchThread(Thread):
         self.final()
 
 
+class QueueThread(Thread):
+    """
+    Runs (index, method, args) tasks from a shared queue until it is empty,
+    storing each return value, or the exception raised, at its index in
+    results.
+    """
+    def __init__(self, tasks, results, *args, **kwargs):
+        self.tasks = tasks
+        self.results = results
+        super().__init__(*args, **kwargs)
+
+    def run(self):
+        while True:
+            try:
+                index, method, args = self.tasks.get_nowait()
+            except Empty:
+                break
+
+            try:
+                self.results[index] = method(*args)
+            except Exception as ex:
+                self.results[index] = ex
+
+        self.final()
+
+
 def generic_prefetch(method, args):
     def ret():
         return method(*args)
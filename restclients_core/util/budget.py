@@ -0,0 +1,32 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from threading import Lock
+
+
+class RequestBudget(object):
+    """
+    Limits extra requests, like hedges and retries, to a ratio of a
+    service's regular requests.  Each regular request adds ratio of a token,
+    up to max_tokens, and each extra request spends a whole one.
+    """
+    def __init__(self, ratio, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        """
+        Returns whether an extra request can be made, spending a token if
+        it can.
+        """
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
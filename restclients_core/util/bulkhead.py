@@ -0,0 +1,59 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from threading import Condition
+
+
+class Bulkhead(object):
+    """
+    Limits a service's concurrent requests to max_concurrent.  Up to
+    max_queued more requests can wait for a turn, and any beyond that are
+    refused.
+
+    on_change, if given, is called with the numbers of in-flight and
+    queued requests whenever they change.
+    """
+    def __init__(self, max_concurrent, max_queued=0, on_change=None):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.on_change = on_change
+        self.in_flight = 0
+        self.queued = 0
+        self._condition = Condition()
+
+    def acquire(self, timeout=0):
+        """
+        Returns whether the request was admitted, after waiting up to
+        timeout seconds in the queue.  Each admitted request must be
+        followed by a call to release().
+        """
+        with self._condition:
+            if self.in_flight < self.max_concurrent:
+                self.in_flight += 1
+                self._changed()
+                return True
+
+            if self.queued >= self.max_queued or timeout <= 0:
+                return False
+
+            self.queued += 1
+            self._changed()
+            try:
+                admitted = self._condition.wait_for(
+                    lambda: self.in_flight < self.max_concurrent, timeout)
+                if admitted:
+                    self.in_flight += 1
+            finally:
+                self.queued -= 1
+                self._changed()
+            return admitted
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._changed()
+            self._condition.notify()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self.in_flight, self.queued)
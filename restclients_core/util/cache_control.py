@@ -0,0 +1,83 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from email.utils import parsedate_to_datetime
+import time
+
+# Directives that keep a response out of a cache shared by all users
+NOT_STORABLE_DIRECTIVES = ("no-store", "no-cache", "private")
+
+
+def get_header(headers, name, default=None):
+    """
+    Case-insensitive lookup in a dict of response headers.
+    """
+    if not headers:
+        return default
+
+    name = name.lower()
+    for header in headers:
+        if header.lower() == name:
+            return headers[header]
+    return default
+
+
+def parse_cache_control(value):
+    """
+    Returns a dict of the directives in a Cache-Control header value.
+    Directives without an argument have a value of None.
+    """
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('" ') or None
+    return directives
+
+
+def get_freshness_lifetime(headers, max_lifetime=None):
+    """
+    Returns the number of seconds a response may be cached by a shared
+    cache, according to its Cache-Control and Expires headers, up to
+    max_lifetime if that is given.  Returns 0 if the response must not be
+    stored, and None if the headers don't say.
+    """
+    lifetime = _get_freshness_lifetime(headers)
+    if lifetime is not None and max_lifetime is not None:
+        lifetime = min(lifetime, float(max_lifetime))
+    return lifetime
+
+
+def _get_freshness_lifetime(headers):
+    directives = parse_cache_control(get_header(headers, "Cache-Control"))
+
+    for directive in NOT_STORABLE_DIRECTIVES:
+        if directive in directives:
+            return 0
+
+    for directive in ("s-maxage", "max-age"):
+        if directive in directives:
+            try:
+                return max(0, int(directives[directive]))
+            except (TypeError, ValueError):
+                return 0
+
+    expires = get_header(headers, "Expires")
+    if expires is not None:
+        try:
+            expires = parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError, IndexError):
+            # Invalid dates, like "0", mean already expired
+            return 0
+
+        now = time.time()
+        date = get_header(headers, "Date")
+        if date is not None:
+            try:
+                now = parsedate_to_datetime(date).timestamp()
+            except (TypeError, ValueError, IndexError):
+                pass
+
+        return max(0, int(expires - now))
+
+    return None
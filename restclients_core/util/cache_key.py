@@ -0,0 +1,58 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from restclients_core.util.cache_control import get_header
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from hashlib import sha256
+import re
+
+PERCENT_ENCODED = re.compile(r"%[0-9a-fA-F]{2}")
+UNRESERVED = re.compile(r"[A-Za-z0-9\-._~]")
+
+
+def _normalize_percent_encoding(match):
+    # Decode needlessly escaped unreserved characters, and use upper case
+    # hex digits for the rest (RFC 3986, section 6.2.2)
+    char = chr(int(match.group(0)[1:], 16))
+    if UNRESERVED.match(char):
+        return char
+    return match.group(0).upper()
+
+
+def normalize_url(url):
+    """
+    Returns a canonical form of a url for use in a cache key: query
+    parameters are sorted by name, percent-encoding is normalized, a
+    trailing slash and any fragment are removed, and the scheme and host
+    are lower cased.
+    """
+    scheme, netloc, path, query, fragment = urlsplit(url)
+
+    path = PERCENT_ENCODED.sub(_normalize_percent_encoding, path)
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+
+    params = parse_qsl(query, keep_blank_values=True)
+    # A stable sort, so repeated parameters keep their order
+    params.sort(key=lambda param: param[0])
+
+    return urlunsplit((scheme.lower(), netloc.lower(), path,
+                       urlencode(params), ""))
+
+
+def get_cache_key(url, headers=None, normalize=False, vary_headers=()):
+    """
+    Returns the url to use as a cache key.  The values of any vary_headers
+    in the request are hashed into the key, so responses that depend on
+    them (Authorization, Accept, ...) are cached separately.
+    """
+    if normalize:
+        url = normalize_url(url)
+
+    if vary_headers:
+        values = ["{}:{}".format(name.lower(), get_header(headers, name, ""))
+                  for name in sorted(vary_headers, key=str.lower)]
+        digest = sha256("\n".join(values).encode("utf-8")).hexdigest()
+        url = "{}#vary={}".format(url, digest)
+
+    return url
@@ -0,0 +1,80 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from threading import Lock
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker(object):
+    """
+    Counts a service's consecutive failed requests.  After
+    failure_threshold of them the circuit opens, and requests are refused
+    until reset_timeout seconds have passed.  The circuit is then half
+    open: up to half_open_requests probe requests are let through, and the
+    first result closes the circuit again, or re-opens it.
+
+    on_transition, if given, is called with the new state on each change.
+    """
+    def __init__(self, failure_threshold, reset_timeout, half_open_requests=1,
+                 on_transition=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_requests = half_open_requests
+        self.on_transition = on_transition
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+        self._lock = Lock()
+
+    def allow_request(self):
+        """
+        Returns whether a request can be made.  Each allowed request must be
+        followed by a call to record_success() or record_failure().
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.time() - self.opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+                self.probes = 0
+
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_requests:
+                    return False
+                self.probes += 1
+
+            return True
+
+    def cancel_request(self):
+        """
+        Call instead of record_success() or record_failure() if an allowed
+        request wasn't made, to give back its half open probe.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                    self.state == CLOSED and
+                    self.failures >= self.failure_threshold):
+                self.opened_at = time.time()
+                self._set_state(OPEN)
+
+    def _set_state(self, state):
+        self.state = state
+        if self.on_transition is not None:
+            self.on_transition(state)
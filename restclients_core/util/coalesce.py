@@ -0,0 +1,91 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from threading import Event, Lock
+from weakref import WeakKeyDictionary
+import asyncio
+
+
+class Call(object):
+    def __init__(self):
+        self.done = Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key, so that only one of them
+    runs and the others wait for, and share, its result or exception.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+
+    def call(self, key, method, *args):
+        """
+        Returns a tuple of the method's return value, and whether the value
+        came from a call made by another thread.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                leader = True
+                call = Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = method(*args)
+            return call.value, False
+        except Exception as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight(object):
+    """
+    Coalesces concurrent coroutine calls with the same key, within an event
+    loop.  Calls made from different event loops are never shared.
+    """
+    def __init__(self):
+        self._calls = WeakKeyDictionary()
+
+    async def call(self, key, method, *args):
+        """
+        Returns a tuple of the awaited method's return value, and whether the
+        value came from a call made by another task.
+        """
+        calls = self._calls.setdefault(asyncio.get_running_loop(), {})
+
+        future = calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        calls[key] = future
+        try:
+            value = await method(*args)
+            future.set_result(value)
+            return value, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as ex:
+            future.set_exception(ex)
+            # Don't warn about the exception if no other task was waiting
+            future.exception()
+            raise
+        finally:
+            del calls[key]
@@ -0,0 +1,75 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from restclients_core.models import CacheHTTP
+from prometheus_client import Histogram
+import time
+import zlib
+
+prometheus_compression_ratio = Histogram(
+    'restclient_cache_compression_ratio',
+    'Restclient cached body size reduction (original / compressed)',
+    ['service'],
+    buckets=[1, 1.5, 2, 3, 4, 6, 8, 10, 15, 20])
+prometheus_compression_time = Histogram(
+    'restclient_cache_compression_cpu_seconds',
+    'Restclient cached body compression CPU time (seconds)',
+    ['service', 'operation'],
+    buckets=[.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1])
+
+
+def compress_body(service, data, min_size, level=6):
+    """
+    Returns a tuple of the zlib compressed body and the text encoding of
+    the original, or None if the body is smaller than min_size or doesn't
+    get any smaller.
+    """
+    if not data or len(data) < min_size:
+        return None
+
+    encoding = None
+    if isinstance(data, str):
+        encoding = "utf-8"
+        data = data.encode(encoding)
+
+    start_time = time.thread_time()
+    compressed = zlib.compress(data, level)
+    prometheus_compression_time.labels(service, "compress").observe(
+        time.thread_time() - start_time)
+
+    if len(compressed) >= len(data):
+        return None
+
+    prometheus_compression_ratio.labels(service).observe(
+        len(data) / len(compressed))
+    return compressed, encoding
+
+
+def decompress_body(service, body, encoding=None):
+    start_time = time.thread_time()
+    data = zlib.decompress(body)
+    prometheus_compression_time.labels(service, "decompress").observe(
+        time.thread_time() - start_time)
+
+    if encoding is not None:
+        data = data.decode(encoding)
+    return data
+
+
+class CompressedCacheHTTP(CacheHTTP):
+    """
+    A cached response with a compressed body, which is decompressed the
+    first time it is read.
+    """
+    def __init__(self, service, body, encoding=None):
+        self._service = service
+        self._body = body
+        self._encoding = encoding
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = decompress_body(self._service, self._body,
+                                         self._encoding)
+        return self._data
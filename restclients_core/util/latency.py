@@ -0,0 +1,36 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from collections import deque
+from threading import Lock
+import math
+
+
+class LatencyWindow(object):
+    """
+    The most recent response times of a service, in seconds.
+    """
+    def __init__(self, size):
+        self._samples = deque(maxlen=size)
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent):
+        """
+        Returns the nearest-rank percentile of the samples, or None if there
+        aren't any.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+
+        if not samples:
+            return None
+
+        rank = int(math.ceil(percent / 100.0 * len(samples)))
+        return samples[min(max(rank, 1), len(samples)) - 1]
@@ -0,0 +1,33 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from restclients_core.exceptions import ImproperlyConfigured
+from importlib import import_module
+
+_classes = {}
+
+
+def get_class(value):
+    """
+    Returns the class named by a dotted path setting value, such as
+    DAO_CLASS or DAO_CACHE_CLASS.  Each path is only imported once.
+    """
+    try:
+        return _classes[value]
+    except KeyError:
+        pass
+
+    module, attr = value.rsplit('.', 1)
+    try:
+        mod = import_module(module)
+    except ImportError as e:
+        raise ImproperlyConfigured(
+            "Error importing module {}: {}".format(module, e))
+    try:
+        config_module = getattr(mod, attr)
+    except AttributeError:
+        raise ImproperlyConfigured(
+            "Module {} missing {} class".format(module, attr))
+
+    _classes[value] = config_module
+    return config_module
@@ -0,0 +1,39 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from threading import Lock
+import time
+
+
+class RateLimiter(object):
+    """
+    A token bucket, shared by the threads of a process, that allows rate
+    requests per second on average, in bursts of up to burst requests.
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = Lock()
+
+    def reserve(self, timeout=0):
+        """
+        Reserves a request, returning the number of seconds the caller must
+        wait before making it.  Returns None, without reserving, if the wait
+        would be longer than timeout.  Callers that wait are served in the
+        order they reserved.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            wait = 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if wait > timeout:
+                return None
+
+            # Tokens go negative while callers wait for them
+            self.tokens -= 1
+            return wait
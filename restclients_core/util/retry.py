@@ -3,11 +3,12 @@
 
 from restclients_core.exceptions import DataFailureException
 import math
+import random
 import time
 
 
 def retry(ExceptionToCheck, tries=4, delay=3, backoff=2, status_codes=[],
-          logger=None):
+          logger=None, jitter=False):
     """
     Decorator function for retrying the decorated function,
     using an exponential or fixed backoff.
@@ -22,6 +23,8 @@ def retry(ExceptionToCheck, tries=4, delay=3, backoff=2, status_codes=[],
     status_codes: list of http status codes to check for retrying, only applies
          when ExceptionToCheck is a DataFailureException
     logger: logging.Logger instance
+    jitter: if True, sleep a random time of up to the delay ("full
+        jitter"), so that clients retrying together spread out
     """
     if backoff is None or backoff <= 0:
         raise ValueError("backoff must be a number greater than 0")
@@ -46,12 +49,13 @@ def retry(ExceptionToCheck, tries=4, delay=3, backoff=2, status_codes=[],
                             err.status not in status_codes):
                         raise
 
+                    sleep = random.uniform(0, mdelay) if jitter else mdelay
                     if logger:
                         logger.warning(
                             "{}: {}, Retrying in {} seconds.".format(
-                                f.__name__, err, mdelay))
+                                f.__name__, err, sleep))
 
-                    time.sleep(mdelay)
+                    time.sleep(sleep)
                     mtries -= 1
                     mdelay *= backoff
 
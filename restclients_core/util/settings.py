@@ -0,0 +1,79 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from commonconf import settings
+from commonconf.proxy import ConfProxy
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:
+    setting_changed = None
+
+MISSING = object()
+
+_service_settings = {}
+_state = None
+_generation = 0
+
+
+class ServiceSettings(object):
+    """
+    The RESTCLIENTS_ settings of a service, or the global settings if
+    service is None.  Each setting is read from commonconf the first time
+    it is asked for; get_service_settings() replaces the object when the
+    settings change.
+    """
+    __slots__ = ("service", "_prefix", "_values")
+
+    def __init__(self, service=None):
+        self.service = service
+        self._prefix = None
+        if service is not None:
+            self._prefix = "RESTCLIENTS_{}_".format(service.upper())
+        self._values = {}
+
+    def get(self, key, default=None):
+        """
+        Returns RESTCLIENTS_<SERVICE>_<KEY> if it is set, otherwise
+        RESTCLIENTS_<KEY>, otherwise default.
+        """
+        try:
+            value = self._values[key]
+        except KeyError:
+            value = MISSING
+            if self._prefix is not None:
+                value = getattr(settings, self._prefix + key, MISSING)
+            if value is MISSING:
+                value = getattr(settings, "RESTCLIENTS_" + key, MISSING)
+            self._values[key] = value
+
+        return default if value is MISSING else value
+
+
+def get_service_settings(service=None):
+    """
+    Returns the current ServiceSettings for a service.
+    """
+    global _state
+    state = (ConfProxy.backend, ConfProxy.overrides, _generation)
+    if (_state is None or state[0] is not _state[0] or
+            state[1] is not _state[1] or state[2] != _state[2]):
+        # New settings, from override_settings or a new backend
+        _service_settings.clear()
+        _state = state
+
+    service_settings = _service_settings.get(service)
+    if service_settings is None:
+        service_settings = ServiceSettings(service)
+        _service_settings[service] = service_settings
+    return service_settings
+
+
+def clear_settings_cache(**kwargs):
+    global _generation
+    _generation += 1
+
+
+if setting_changed is not None:
+    # Django's override_settings changes settings under commonconf
+    setting_changed.connect(clear_settings_cache)
@@ -0,0 +1,34 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+from urllib3.util.ssl_ import create_urllib3_context, resolve_cert_reqs
+from threading import Lock
+
+_contexts = {}
+_lock = Lock()
+
+
+def get_ssl_context(ssl_version=None, cert_reqs="CERT_REQUIRED",
+                    ca_certs=None, cert_file=None, key_file=None):
+    """
+    Returns an SSLContext for the TLS settings, shared by every pool that
+    uses them, so the CA bundle and client certificate are only loaded once
+    per process.  Restart the process to pick up changed certificate files.
+    """
+    key = (ssl_version, cert_reqs, ca_certs, cert_file, key_file)
+    context = _contexts.get(key)
+    if context is not None:
+        return context
+
+    with _lock:
+        if key not in _contexts:
+            context = create_urllib3_context(
+                ssl_version=ssl_version,
+                cert_reqs=resolve_cert_reqs(cert_reqs))
+            if ca_certs is not None:
+                context.load_verify_locations(ca_certs)
+            if cert_file is not None:
+                context.load_cert_chain(cert_file, key_file)
+            _contexts[key] = context
+
+    return _contexts[key]
@@ -29,6 +29,7 @@ setup(
                       'python-dateutil',
                       'prometheus-client',
                       'mock'],
+    extras_require={'async': ['aiohttp']},
     license='Apache License, Version 2.0',
     description=('Core code for clients of a variety of RESTful web services '
                  'at the University of Washington'),
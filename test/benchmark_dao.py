@@ -0,0 +1,33 @@
+# Copyright 2024 UW-IT, University of Washington
+# SPDX-License-Identifier: Apache-2.0
+
+#!/usr/bin/python
+# Per-request overhead of resolving a DAO's backend, run from the repo root:
+#     PYTHONPATH=. python test/benchmark_dao.py
+from commonconf.backends import use_configparser_backend
+use_configparser_backend("test/test.conf", "RC")
+
+from restclients_core.tests.dao_implementation.test_backend import TDAO
+from restclients_core.cache import MemoryCache
+from timeit import timeit
+
+NUMBER = 100000
+
+
+class CachedTDAO(TDAO):
+    def get_cache(self):
+        return cache
+
+
+cache = MemoryCache()
+dao = TDAO()
+created = timeit(lambda: dao._get_implementation_factory()(dao),
+                 number=NUMBER)
+reused = timeit(dao.get_implementation, number=NUMBER)
+print("backend per request: {:.2f}us resolved, {:.2f}us cached".format(
+    created / NUMBER * 1e6, reused / NUMBER * 1e6))
+
+cached_dao = CachedTDAO()
+cached_dao.getURL("/ok")
+get_url = timeit(lambda: cached_dao.getURL("/ok"), number=NUMBER)
+print("cached getURL: {:.2f}us".format(get_url / NUMBER * 1e6))
@@ -2,10 +2,8 @@
 # SPDX-License-Identifier: Apache-2.0
 
 #!/usr/bin/python
-try:
-    from http.server import BaseHTTPRequestHandler, HTTPServer
-except ImportError:
-    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
 
 PORT_NUMBER = 9876
 
@@ -18,6 +16,36 @@ class myHandler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(b"ok")
             return
+        elif self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header('ETag', '"v1"')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-type', 'text/html')
+            self.send_header('ETag', '"v1"')
+            self.end_headers()
+            self.wfile.write(b"etag")
+            return
+        elif self.path == "/large":
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain')
+            self.send_header('Content-Length', str(2**20))
+            self.end_headers()
+            self.wfile.write(b"x" * 2**20)
+            return
+        elif self.path == "/gzip":
+            body = b"compressible " * 1000
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain')
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
         elif self.path == "/403":
             self.send_response(403)
             self.end_headers()
@@ -44,5 +72,5 @@ class myHandler(BaseHTTPRequestHandler):
         return
 
 
-server = HTTPServer(('localhost', PORT_NUMBER), myHandler)
+server = ThreadingHTTPServer(('localhost', PORT_NUMBER), myHandler)
 server.serve_forever()